@@ -0,0 +1,348 @@
+"""Batch re-crawls of many (city, locality) pairs on a shared, rate-limited worker pool.
+
+    python -m app.crawl run localities.csv --sources squareyard,housing --pages 2
+    python -m app.crawl resume <batch id>
+    python -m app.crawl status <batch id>
+
+The CSV needs city and locality columns. Progress is checkpointed per task in CRAWL_DB,
+so a batch interrupted by a crash or restart picks up with `resume`.
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from app.sources import CARD_SOURCES
+from app.utils import changes, metrics
+
+logger = logging.getLogger(__name__)
+
+CRAWL_DB = os.getenv("CRAWL_DB", "scrape_crawl.sqlite3")
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "6"))
+CRAWL_MAX_ATTEMPTS = int(os.getenv("CRAWL_MAX_ATTEMPTS", "2"))
+# Tasks per source allowed to run at once; NoBroker holds a browser for its whole scroll.
+SOURCE_CONCURRENCY = {
+    source: int(os.getenv(f"CRAWL_CONCURRENCY_{source.upper()}", default))
+    for source, default in (("squareyard", "3"), ("nobroker", "2"), ("housing", "3"))
+}
+
+TASK_STATES = ("pending", "running", "done", "failed")
+
+class CheckpointStore:
+    def __init__(self, path=CRAWL_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id TEXT PRIMARY KEY, created_at REAL NOT NULL, finished_at REAL, spec TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "batch_id TEXT NOT NULL, source TEXT NOT NULL, city TEXT NOT NULL, locality TEXT NOT NULL, "
+                "page INTEGER NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT, "
+                "added INTEGER, changed INTEGER, removed INTEGER, unchanged INTEGER, delta BLOB, finished_at REAL, "
+                "PRIMARY KEY (batch_id, source, city, locality, page))"
+            )
+
+    def create(self, batch_id, spec, tasks):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO batches (id, created_at, spec) VALUES (?, ?, ?)",
+                (batch_id, time.time(), json.dumps(spec)),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tasks (batch_id, source, city, locality, page, status) VALUES (?, ?, ?, ?, ?, 'pending')",
+                [(batch_id,) + task for task in tasks],
+            )
+
+    def spec(self, batch_id):
+        with self._lock:
+            row = self._conn.execute("SELECT spec FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def created_at(self, batch_id):
+        with self._lock:
+            row = self._conn.execute("SELECT created_at FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return row[0] if row else None
+
+    def others_done(self, batch_id, task):
+        # Whether every other page of this task's source/city/locality is done.
+        source, city, locality, page = task
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE batch_id = ? AND source = ? AND city = ? AND locality = ? "
+                "AND page != ? AND status != 'done'",
+                (batch_id, source, city, locality, page),
+            ).fetchone()[0] == 0
+
+    def unfinished(self, batch_id):
+        # Everything not done: pending, failed, and tasks left "running" by a crashed process.
+        with self._lock:
+            return self._conn.execute(
+                "SELECT source, city, locality, page, attempts FROM tasks WHERE batch_id = ? AND status != 'done'",
+                (batch_id,),
+            ).fetchall()
+
+    def mark(self, batch_id, task, status, attempts=None, error=None, delta=None):
+        source, city, locality, page = task
+        counts = (None, None, None, None)
+        blob = None
+        if delta is not None:
+            counts = (len(delta["added"]), len(delta["changed"]), len(delta["removed"]), delta["unchanged"])
+            blob = zlib.compress(json.dumps({key: delta[key] for key in ("added", "changed", "removed")}).encode())
+        finished_at = time.time() if status in ("done", "failed") else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, attempts = COALESCE(?, attempts), error = ?, added = ?, changed = ?, "
+                "removed = ?, unchanged = ?, delta = ?, finished_at = ? "
+                "WHERE batch_id = ? AND source = ? AND city = ? AND locality = ? AND page = ?",
+                (status, attempts, error) + counts + (blob, finished_at, batch_id, source, city, locality, page),
+            )
+            if status in ("done", "failed"):
+                open_tasks = self._conn.execute(
+                    "SELECT COUNT(*) FROM tasks WHERE batch_id = ? AND status IN ('pending', 'running')", (batch_id,)
+                ).fetchone()[0]
+                self._conn.execute(
+                    "UPDATE batches SET finished_at = ? WHERE id = ?",
+                    (time.time() if open_tasks == 0 else None, batch_id),
+                )
+
+    def summary(self, batch_id, include_deltas=False):
+        with self._lock:
+            batch = self._conn.execute("SELECT created_at, finished_at FROM batches WHERE id = ?", (batch_id,)).fetchone()
+            if batch is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT source, city, locality, page, status, attempts, error, added, changed, removed, unchanged, delta "
+                "FROM tasks WHERE batch_id = ? ORDER BY city, locality, source, page",
+                (batch_id,),
+            ).fetchall()
+        states = {state: 0 for state in TASK_STATES}
+        totals = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        tasks = []
+        for source, city, locality, page, status, attempts, error, added, changed, removed, unchanged, delta in rows:
+            states[status] += 1
+            counts = {"added": added, "changed": changed, "removed": removed, "unchanged": unchanged}
+            for key, value in counts.items():
+                totals[key] += value or 0
+            task = {"source": source, "city": city, "locality": locality, "page": page,
+                    "status": status, "attempts": attempts, "error": error, **counts}
+            if include_deltas and delta is not None:
+                task.update(json.loads(zlib.decompress(delta)))
+            tasks.append(task)
+        if states["pending"] or states["running"]:
+            status = "running" if states["running"] or states["done"] or states["failed"] else "queued"
+        else:
+            status = "failed" if states["failed"] == len(rows) else "done"
+        return {
+            "id": batch_id,
+            "status": status,
+            "createdAt": batch[0],
+            "finishedAt": batch[1],
+            "progress": {**states, "total": len(rows)},
+            "changes": totals,
+            "tasks": tasks,
+        }
+
+class CrawlScheduler:
+    # One pool of workers shared by every batch. Each source keeps its own heap ordered by
+    # staleness (least recently crawled first), and a worker takes the stalest task among
+    # the sources that are below their concurrency cap.
+    def __init__(self, workers=CRAWL_WORKERS, concurrency=SOURCE_CONCURRENCY, max_attempts=CRAWL_MAX_ATTEMPTS, store_factory=CheckpointStore):
+        self.workers = workers
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.store_factory = store_factory
+        self._store = None
+        self._heaps = {source: [] for source in CARD_SOURCES}
+        self._running = {source: 0 for source in CARD_SOURCES}
+        self._active = {}
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        # Serialises "are the other pages done" with marking a page done, so exactly one
+        # task per locality sweeps it.
+        self._sweep_lock = threading.Lock()
+        self._started = False
+
+    @property
+    def store(self):
+        with self._cond:
+            if self._store is None:
+                self._store = self.store_factory()
+            return self._store
+
+    def _start_workers(self):
+        for n in range(self.workers):
+            threading.Thread(target=self._work, name=f"crawl-{n}", daemon=True).start()
+        self._started = True
+
+    def submit(self, localities, sources, pages=1, use_cache=True, fetch_mode="auto"):
+        batch_id = uuid.uuid4().hex
+        tasks = [
+            (source, city, locality, page)
+            for city, locality in localities
+            for source in sorted(set(sources))
+            for page in range(1, pages + 1)
+        ]
+        spec = {"sources": sorted(set(sources)), "pages": pages, "useCache": use_cache, "fetchMode": fetch_mode}
+        self.store.create(batch_id, spec, tasks)
+        self._enqueue(batch_id, [task + (0,) for task in tasks], use_cache, fetch_mode)
+        return batch_id
+
+    def resume(self, batch_id):
+        # Returns the number of tasks queued again, or None for an unknown batch. A batch
+        # that still has tasks queued in this process is left alone.
+        spec = self.store.spec(batch_id)
+        if spec is None:
+            return None
+        with self._cond:
+            if self._active.get(batch_id):
+                return 0
+        tasks = self.store.unfinished(batch_id)
+        self._enqueue(batch_id, tasks, spec["useCache"], spec["fetchMode"])
+        return len(tasks)
+
+    def _enqueue(self, batch_id, tasks, use_cache, fetch_mode):
+        tracker = changes.tracker()
+        entries = [
+            (tracker.last_crawled(source, city, locality, page) or 0.0, source, city, locality, page, attempts)
+            for source, city, locality, page, attempts in tasks
+        ]
+        with self._cond:
+            if not self._started:
+                self._start_workers()
+            for last_crawled, source, city, locality, page, attempts in entries:
+                heapq.heappush(self._heaps[source], (last_crawled, next(self._order), batch_id, (source, city, locality, page), attempts, use_cache, fetch_mode))
+            self._active[batch_id] = self._active.get(batch_id, 0) + len(entries)
+            self._cond.notify_all()
+
+    def _next(self):
+        with self._cond:
+            while True:
+                ready = [source for source, heap in self._heaps.items() if heap and self._running[source] < self.concurrency.get(source, 1)]
+                if ready:
+                    source = min(ready, key=lambda name: self._heaps[name][0][:2])
+                    self._running[source] += 1
+                    return heapq.heappop(self._heaps[source])[2:]
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            batch_id, task, attempts, use_cache, fetch_mode = self._next()
+            retry = False
+            try:
+                retry = self._run(batch_id, task, attempts + 1, use_cache, fetch_mode)
+            except Exception as e:
+                # _run handles scrape errors; this is the checkpoint store itself failing
+                # (locked or full disk). The worker must survive it or the pool shrinks.
+                metrics.failure(task[0], e)
+                logger.exception("crawl task %s of batch %s failed", task, batch_id)
+                retry = attempts + 1 < self.max_attempts
+                try:
+                    self.store.mark(batch_id, task, "pending" if retry else "failed", error=str(e))
+                except sqlite3.Error:
+                    logger.warning("could not checkpoint crawl task %s of batch %s", task, batch_id)
+            finally:
+                with self._cond:
+                    self._running[task[0]] -= 1
+                    if retry:
+                        # Back of the line: a failed task should not starve the rest.
+                        heapq.heappush(self._heaps[task[0]], (time.time(), next(self._order), batch_id, task, attempts + 1, use_cache, fetch_mode))
+                    else:
+                        self._active[batch_id] -= 1
+                        if not self._active[batch_id]:
+                            del self._active[batch_id]
+                    self._cond.notify_all()
+
+    def _run(self, batch_id, task, attempt, use_cache, fetch_mode):
+        source, city, locality, page = task
+        cards, enrich = CARD_SOURCES[source]
+        self.store.mark(batch_id, task, "running", attempts=attempt)
+        try:
+            # The listing tracker is updated before the checkpoint; a task redone after a
+            # crash in between just reports an empty delta.
+            delta = changes.recrawl(source, city, locality, page, cards(city, locality, page, use_cache, fetch_mode), lambda prop: enrich(prop, use_cache))
+        except Exception as e:
+            metrics.failure(source, e)
+            retry = attempt < self.max_attempts
+            self.store.mark(batch_id, task, "pending" if retry else "failed", error=str(e))
+            return retry
+        with self._sweep_lock:
+            if self.store.others_done(batch_id, task):
+                # The last page of this locality to finish reports what dropped out of the
+                # whole crawl; a listing missing from one page has usually just moved.
+                spec = self.store.spec(batch_id)
+                delta["removed"] = changes.sweep(source, city, locality, self.store.created_at(batch_id), spec["pages"])
+            self.store.mark(batch_id, task, "done", delta=delta)
+        return False
+
+    def status(self, batch_id, include_deltas=False):
+        return self.store.summary(batch_id, include_deltas)
+
+    def wait(self, batch_id, poll=1.0, report=None):
+        while True:
+            summary = self.status(batch_id)
+            if report:
+                report(summary)
+            with self._cond:
+                active = self._active.get(batch_id)
+            if not active:
+                return self.status(batch_id)
+            time.sleep(poll)
+
+scheduler = CrawlScheduler()
+
+def read_localities(path):
+    with open(path, newline="") as f:
+        return [(row["city"], row["locality"]) for row in csv.DictReader(f) if row.get("city") and row.get("locality")]
+
+def print_progress(summary):
+    progress = summary["progress"]
+    print(f"{summary['id']} {summary['status']}: {progress['done']} done, {progress['failed']} failed, "
+          f"{progress['running']} running, {progress['pending']} pending of {progress['total']}", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-crawl many localities with rate limits and resumable checkpoints.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Start a batch from a CSV with city and locality columns and wait for it")
+    run.add_argument("csv_path")
+    run.add_argument("--sources", default=",".join(CARD_SOURCES), help="Comma-separated sources")
+    run.add_argument("--pages", type=int, default=1, help="API pages to crawl per locality")
+    run.add_argument("--no-cache", action="store_true", help="Bypass cached pages and detail lookups")
+    run.add_argument("--fetch-mode", default="auto", choices=("auto", "http", "browser"))
+    resume = commands.add_parser("resume", help="Continue an interrupted batch and wait for it")
+    resume.add_argument("batch_id")
+    status = commands.add_parser("status", help="Show a batch's progress")
+    status.add_argument("batch_id")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        sources = [source.strip() for source in args.sources.split(",") if source.strip()]
+        unknown = set(sources) - set(CARD_SOURCES)
+        if unknown or not sources:
+            parser.error(f"unknown sources: {sorted(unknown)}" if unknown else "no sources given")
+        batch_id = scheduler.submit(read_localities(args.csv_path), sources, args.pages, not args.no_cache, args.fetch_mode)
+        print(f"batch {batch_id}", file=sys.stderr)
+    else:
+        batch_id = args.batch_id
+        if args.command == "resume" and scheduler.resume(batch_id) is None:
+            parser.error(f"unknown batch {batch_id}")
+    summary = scheduler.status(batch_id) if args.command == "status" else scheduler.wait(batch_id, report=print_progress)
+    if summary is None:
+        parser.error(f"unknown batch {batch_id}")
+    summary.pop("tasks")
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["progress"]["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from app.sources import SOURCES
+from app.utils import history, metrics
+
+JOB_WORKERS_PER_SOURCE = int(os.getenv("JOB_WORKERS_PER_SOURCE", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+class JobQueueFull(RuntimeError):
+    pass
+
+class Job:
+    def __init__(self, key, sources, city, locality, page, use_cache, fetch_mode):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.sources = sources
+        self.city = city
+        self.locality = locality
+        self.page = page
+        self.use_cache = use_cache
+        self.fetch_mode = fetch_mode
+        self.created_at = time.time()
+        self.finished_at = None
+        self.source_status = {source: "queued" for source in sources}
+        self.results = {source: [] for source in sources}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        states = set(self.source_status.values())
+        if states <= {"done", "failed"}:
+            return "failed" if states == {"failed"} else "done"
+        if states == {"queued"}:
+            return "queued"
+        return "running"
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def start(self, source):
+        with self._lock:
+            self.source_status[source] = "running"
+
+    def add(self, source, prop):
+        with self._lock:
+            self.results[source].append(prop)
+
+    def finish(self, source, error=None):
+        with self._lock:
+            self.source_status[source] = "failed" if error else "done"
+            if error:
+                self.errors[source] = error
+            if all(state in ("done", "failed") for state in self.source_status.values()):
+                self.finished_at = time.time()
+
+    def to_dict(self):
+        with self._lock:
+            results = {source: list(props) for source, props in self.results.items()}
+            source_status = dict(self.source_status)
+            errors = dict(self.errors)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "city": self.city,
+            "locality": self.locality,
+            "page": self.page,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+            "progress": {
+                "sources": source_status,
+                "sourcesDone": sum(state in ("done", "failed") for state in source_status.values()),
+                "sourcesTotal": len(source_status),
+                "listings": sum(len(props) for props in results.values()),
+            },
+            "errors": errors,
+            "results": results,
+        }
+
+class JobManager:
+    def __init__(self, workers_per_source=JOB_WORKERS_PER_SOURCE, queue_size=JOB_QUEUE_SIZE, retention=JOB_RETENTION):
+        self.workers_per_source = workers_per_source
+        self.retention = retention
+        self._queues = {source: queue.Queue(maxsize=queue_size) for source in SOURCES}
+        self._jobs = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _start_workers(self):
+        for source, source_queue in self._queues.items():
+            for n in range(self.workers_per_source):
+                threading.Thread(target=self._work, args=(source, source_queue), name=f"job-{source}-{n}", daemon=True).start()
+        self._started = True
+
+    def _work(self, source, source_queue):
+        while True:
+            job = source_queue.get()
+            job.start(source)
+            try:
+                for prop in SOURCES[source](job.city, job.locality, job.page, use_cache=job.use_cache, fetch_mode=job.fetch_mode):
+                    job.add(source, prop)
+            except Exception as e:
+                metrics.failure(source, e)
+                job.finish(source, str(e))
+            else:
+                history.record(source, job.city, job.locality, job.page, job.results[source])
+                job.finish(source)
+            finally:
+                source_queue.task_done()
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+        for key, job in list(self._inflight.items()):
+            if job.finished:
+                del self._inflight[key]
+
+    def submit(self, sources, city, locality, page=1, use_cache=True, fetch_mode="auto"):
+        sources = sorted(set(sources))
+        key = (tuple(sources), city.strip().lower(), locality.strip().lower(), page, use_cache, fetch_mode)
+        with self._lock:
+            if not self._started:
+                self._start_workers()
+            self._purge()
+            job = self._inflight.get(key)
+            if job is not None and not job.finished:
+                return job
+            if any(self._queues[source].full() for source in sources):
+                raise JobQueueFull("Too many scrape jobs queued, try again later")
+            job = Job(key, sources, city, locality, page, use_cache, fetch_mode)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            for source in sources:
+                self._queues[source].put_nowait(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "inflight": len(self._inflight),
+                "queued": {source: q.qsize() for source, q in self._queues.items()},
+            }
+
+manager = JobManager()
@@ -1,65 +1,220 @@
-import concurrent.futures
-import json
 import time
 import os
-from fastapi import FastAPI, HTTPException, Query
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from app import crawl, jobs
 from app.scrapers import squareyard, nobroker, housing
+from app.sources import CARD_SOURCES, SOURCE_URLS, SOURCES
+from app.utils import cache, changes, driver_pool, fetch, history, merge, metrics, ratelimit, readiness, resilience, streaming, timing
 
 app = FastAPI(title="Property Scraper API", description="API endpoints to get property listings from Squareyard, NoBroker, and Housing.com.", version="1.0.0")
 
-def save_json(data, filename):
-    with open(filename, 'w') as f:
-        json.dump(data, f)
+@app.on_event("shutdown")
+def close_driver_pool():
+    driver_pool.pool.close()
+
+@app.on_event("shutdown")
+def flush_history():
+    history.flush()
+
+@app.middleware("http")
+async def record_timing(request: Request, call_next):
+    # Spans recorded while handling the request are collected for the optional X-Timing
+    # header; send "X-Timing: 1" or ?timing=1 to get the breakdown back. Cache lookups are
+    # collected the same way for the X-Cache-* headers.
+    spans = timing.start_request()
+    cache.start_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - started
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.labels(route.path if route else "unmatched", str(response.status_code)).observe(total)
+    if request.headers.get("x-timing") or request.query_params.get("timing"):
+        response.headers["X-Timing"] = timing.header(spans, total)
+    return response
+
+def set_cache_headers(response):
+    # Lookups made for this response only; /cache/stats has the process-wide counters.
+    stats = cache.request_stats()
+    response.headers["X-Cache-Hit-Ratio"] = str(stats["hit_ratio"])
+    response.headers["X-Cache-Lookups"] = str(stats["memory_hits"] + stats["disk_hits"] + stats["misses"])
 
 @app.get("/squareyard", summary="Squareyard Listings")
-def get_squareyard(city: str = Query(..., example="Delhi"), locality: str = Query(..., example="Saket"), page: int = Query(1, ge=1, description="Page number (10 results per page)")):
+def get_squareyard(response: Response, city: str = Query(..., example="Delhi"), locality: str = Query(..., example="Saket"), page: int = Query(1, ge=1, description="Page number (10 results per page)"), no_cache: bool = Query(False, description="Bypass cached pages and detail lookups"), fetch_mode: str = Query("auto", pattern="^(auto|http|browser)$", description="auto, http or browser")):
     try:
-        results = squareyard.scrape_squareyard(city, locality, page)
-        timestamp = time.strftime("%Y%m%d%H%M%S")
-        filename = f"squareyard_{city}_{locality}_{timestamp}.json"
-        save_json(results, filename)
+        results = squareyard.scrape_squareyard(city, locality, page, use_cache=not no_cache, fetch_mode=fetch_mode)
+        history.record("squareyard", city, locality, page, results)
+        set_cache_headers(response)
         return {"data": results}
     except Exception as e:
+        metrics.failure("squareyard", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/nobroker", summary="NoBroker Listings")
-def get_nobroker(city: str = Query(..., example="Mumbai"), locality: str = Query(..., example="Powai"), page: int = Query(1, ge=1, description="Page number (10 results per page)")):
+def get_nobroker(response: Response, city: str = Query(..., example="Mumbai"), locality: str = Query(..., example="Powai"), page: int = Query(1, ge=1, description="Page number (10 results per page)"), no_cache: bool = Query(False, description="Bypass cached pages and detail lookups"), fetch_mode: str = Query("auto", pattern="^(auto|http|browser)$", description="auto, http or browser")):
     try:
-        results = nobroker.scrape_nobroker(city, locality, page)
-        timestamp = time.strftime("%Y%m%d%H%M%S")
-        filename = f"nobroker_{city}_{locality}_{timestamp}.json"
-        save_json(results, filename)
+        results = nobroker.scrape_nobroker(city, locality, page, use_cache=not no_cache, fetch_mode=fetch_mode)
+        history.record("nobroker", city, locality, page, results)
+        set_cache_headers(response)
         return {"data": results}
     except Exception as e:
+        metrics.failure("nobroker", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/housing", summary="Housing.com Listings")
-def get_housing(city: str = Query(..., example="Gurgaon"), locality: str = Query(..., example="Sector 9"), page: int = Query(1, ge=1, description="Page number (10 results per page)")):
+def get_housing(response: Response, city: str = Query(..., example="Gurgaon"), locality: str = Query(..., example="Sector 9"), page: int = Query(1, ge=1, description="Page number (10 results per page)"), no_cache: bool = Query(False, description="Bypass cached pages and detail lookups"), fetch_mode: str = Query("auto", pattern="^(auto|http|browser)$", description="auto, http or browser")):
     try:
-        results = housing.scrape_housing(city, locality, page)
-        timestamp = time.strftime("%Y%m%d%H%M%S")
-        filename = f"housing_{city}_{locality}_{timestamp}.json"
-        save_json(results, filename)
+        results = housing.scrape_housing(city, locality, page, use_cache=not no_cache, fetch_mode=fetch_mode)
+        history.record("housing", city, locality, page, results)
+        set_cache_headers(response)
         return {"data": results}
     except Exception as e:
+        metrics.failure("housing", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/all", summary="All Listings")
-def get_all(city: str = Query(..., example="Delhi"), locality: str = Query(..., example="Saket"), page: int = Query(1, ge=1, description="Page number (10 results per page)")):
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_squareyard = executor.submit(squareyard.scrape_squareyard, city, locality, page)
-        future_nobroker = executor.submit(nobroker.scrape_nobroker, city, locality, page)
-        future_housing = executor.submit(housing.scrape_housing, city, locality, page)
-        results = {
-            "squareyard": future_squareyard.result(),
-            "nobroker": future_nobroker.result(),
-            "housing": future_housing.result()
-        }
-    timestamp = time.strftime("%Y%m%d%H%M%S")
-    filename = f"all_{city}_{locality}_{timestamp}.json"
-    save_json(results, filename)
+def get_all(response: Response, city: str = Query(..., example="Delhi"), locality: str = Query(..., example="Saket"), page: int = Query(1, ge=1, description="Page number (10 results per page)"), no_cache: bool = Query(False, description="Bypass cached pages and detail lookups"), fetch_mode: str = Query("auto", pattern="^(auto|http|browser)$", description="auto, http or browser"), merge_sources: bool = Query(False, alias="merge", description="Also return listings deduplicated across sources"), timeout: Optional[float] = Query(None, gt=0, le=600, description="Seconds to wait for each source; defaults to SOURCE_TIMEOUT")):
+    # Sources run side by side on the shared fan-out pool; one that fails, hangs or has
+    # its circuit open comes back as an empty list with its status instead of failing
+    # the whole response.
+    scrapers = {"squareyard": squareyard.scrape_squareyard, "nobroker": nobroker.scrape_nobroker, "housing": housing.scrape_housing}
+    outcomes = resilience.fan_out({
+        source: (SOURCE_URLS[source], lambda scrape=scrape: scrape(city, locality, page, use_cache=not no_cache, fetch_mode=fetch_mode))
+        for source, scrape in scrapers.items()
+    }, timeout)
+    results, status = {}, {}
+    for source, (listings, state) in outcomes.items():
+        status[source] = state
+        results[source] = listings or []
+        if listings is not None:
+            history.record(source, city, locality, page, listings)
+    if all(state["status"] != "ok" for state in status.values()):
+        raise HTTPException(status_code=502, detail={"status": status})
+    if merge_sources:
+        with timing.span("merge"):
+            results["merged"] = merge.merge([listing for source in scrapers for listing in results[source]])
+    results["status"] = status
+    set_cache_headers(response)
     return results
 
+@app.get("/stream/{source}", summary="Stream Listings as NDJSON or Server-Sent Events")
+def stream_listings(source: str, city: str = Query(..., example="Delhi"), locality: str = Query(..., example="Saket"), page: int = Query(1, ge=1, description="Page number (10 results per page)"), no_cache: bool = Query(False, description="Bypass cached pages and detail lookups"), fetch_mode: str = Query("auto", pattern="^(auto|http|browser)$", description="auto, http or browser"), format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse")):
+    if source != "all" and source not in SOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown source: {source}")
+    names = list(SOURCES) if source == "all" else [source]
+    iterators = {name: SOURCES[name](city, locality, page, use_cache=not no_cache, fetch_mode=fetch_mode) for name in names}
+    body = streaming.encode(streaming.merge(iterators), format)
+    return StreamingResponse(body, media_type=streaming.MEDIA_TYPES[format], headers={"Cache-Control": "no-cache"})
+
+@app.get("/delta/{source}", summary="Listings Added, Changed or Removed Since the Last Crawl")
+def get_delta(source: str, city: str = Query(..., example="Delhi"), locality: str = Query(..., example="Saket"), pages: int = Query(1, ge=1, le=20, description="Pages to crawl from the first; removals are judged across all of them"), no_cache: bool = Query(False, description="Bypass cached pages and detail lookups"), fetch_mode: str = Query("auto", pattern="^(auto|http|browser)$", description="auto, http or browser")):
+    if source not in CARD_SOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown source: {source}")
+    cards, enrich = CARD_SOURCES[source]
+    try:
+        return changes.recrawl_pages(source, city, locality, pages, lambda page: cards(city, locality, page, not no_cache, fetch_mode), lambda prop: enrich(prop, not no_cache))
+    except Exception as e:
+        metrics.failure(source, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+class JobRequest(BaseModel):
+    city: str = Field(..., example="Delhi")
+    locality: str = Field(..., example="Saket")
+    page: int = Field(1, ge=1, description="Page number (10 results per page)")
+    sources: List[str] = Field(default_factory=lambda: list(SOURCES), description="Sources to scrape")
+    no_cache: bool = Field(False, description="Bypass cached pages and detail lookups")
+    fetch_mode: str = Field("auto", pattern="^(auto|http|browser)$", description="auto, http or browser")
+
+@app.post("/jobs", summary="Enqueue a Scrape Job", status_code=202)
+def create_job(request: JobRequest):
+    unknown = set(request.sources) - set(SOURCES)
+    if unknown or not request.sources:
+        raise HTTPException(status_code=422, detail=f"Unknown sources: {sorted(unknown)}" if unknown else "No sources given")
+    try:
+        job = jobs.manager.submit(request.sources, request.city, request.locality, request.page, use_cache=not request.no_cache, fetch_mode=request.fetch_mode)
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}", summary="Scrape Job Status and Results")
+def get_job(job_id: str):
+    job = jobs.manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
+
+@app.get("/history", summary="Previously Scraped Snapshots")
+def get_history(source: Optional[str] = Query(None, description="squareyard, nobroker or housing"), city: Optional[str] = Query(None, example="Delhi"), locality: Optional[str] = Query(None, example="Saket"), since: Optional[float] = Query(None, description="Unix timestamp, inclusive"), until: Optional[float] = Query(None, description="Unix timestamp, exclusive"), limit: int = Query(10, ge=1, le=500, description="Most recent snapshots to return"), listings: bool = Query(True, description="Include the stored listings")):
+    if source is not None and source not in SOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown source: {source}")
+    return {"snapshots": history.query(source, city, locality, since, until, limit, include_listings=listings)}
+
+@app.get("/history/stats", summary="Result Persistence Queue Statistics")
+def get_history_stats():
+    return history.stats()
+
+class CrawlLocality(BaseModel):
+    city: str = Field(..., example="Delhi")
+    locality: str = Field(..., example="Saket")
+
+class CrawlRequest(BaseModel):
+    localities: List[CrawlLocality] = Field(..., min_length=1, description="Localities to re-crawl")
+    sources: List[str] = Field(default_factory=lambda: list(CARD_SOURCES), description="Sources to crawl")
+    pages: int = Field(1, ge=1, le=20, description="API pages to crawl per locality")
+    no_cache: bool = Field(False, description="Bypass cached pages and detail lookups")
+    fetch_mode: str = Field("auto", pattern="^(auto|http|browser)$", description="auto, http or browser")
+
+@app.post("/crawl", summary="Start a Batch Re-crawl of Many Localities", status_code=202)
+def create_crawl(request: CrawlRequest):
+    unknown = set(request.sources) - set(CARD_SOURCES)
+    if unknown or not request.sources:
+        raise HTTPException(status_code=422, detail=f"Unknown sources: {sorted(unknown)}" if unknown else "No sources given")
+    localities = [(item.city, item.locality) for item in request.localities]
+    batch_id = crawl.scheduler.submit(localities, request.sources, request.pages, use_cache=not request.no_cache, fetch_mode=request.fetch_mode)
+    summary = crawl.scheduler.status(batch_id)
+    return {"id": batch_id, "status": summary["status"], "tasks": summary["progress"]["total"]}
+
+@app.get("/crawl/{batch_id}", summary="Batch Re-crawl Progress")
+def get_crawl(batch_id: str, deltas: bool = Query(False, description="Include added, changed and removed listings per task")):
+    summary = crawl.scheduler.status(batch_id, include_deltas=deltas)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return summary
+
+@app.post("/crawl/{batch_id}/resume", summary="Resume an Interrupted Batch Re-crawl", status_code=202)
+def resume_crawl(batch_id: str):
+    queued = crawl.scheduler.resume(batch_id)
+    if queued is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"id": batch_id, "requeued": queued}
+
+@app.get("/resilience/stats", summary="Circuit Breaker and Source Latency State")
+def resilience_stats():
+    return resilience.stats()
+
+@app.get("/ratelimit/stats", summary="Per-Domain Rate Limiter State")
+def get_ratelimit_stats():
+    return ratelimit.stats()
+
+@app.get("/cache/stats", summary="Cache Statistics")
+def get_cache_stats():
+    return cache.stats()
+
+@app.get("/metrics", summary="Prometheus Metrics")
+def get_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/readiness/stats", summary="Page Readiness Wait Statistics")
+def get_readiness_stats():
+    return readiness.stats()
+
+@app.get("/fetch/stats", summary="Fetch Backend Selection State")
+def get_fetch_stats():
+    return fetch.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
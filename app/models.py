@@ -0,0 +1,47 @@
+from dataclasses import dataclass, fields
+
+@dataclass(slots=True)
+class Property:
+    # Attribute names are the API's JSON keys. The raw strings are kept as scraped; the
+    # *Inr / *Sqft fields and the coordinates are filled in as numbers by
+    # app.utils.normalise.
+    city: str = None
+    locality: str = None
+    name: str = None
+    address: str = None
+    link: str = None
+    price: str = None
+    perSqftPrice: str = None
+    emi: str = None
+    builtUp: str = None
+    facing: str = None
+    apartmentType: str = None
+    bathrooms: str = None
+    parking: str = None
+    image: list = None
+    latitude: float = None
+    longitude: float = None
+    possessionStatus: str = None
+    possessionDate: str = None
+    agentName: str = None
+    description: str = None
+    source: str = None
+    priceInr: int = None
+    perSqftPriceInr: int = None
+    emiInr: int = None
+    builtUpSqft: float = None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in FIELDS if name in data})
+
+FIELDS = tuple(field.name for field in fields(Property))
+
+def to_dicts(props):
+    return [prop.to_dict() for prop in props]
+
+def from_dicts(rows):
+    return [Property.from_dict(row) for row in rows]
@@ -1,28 +1,53 @@
-import time
 import json
+import os
 import requests
 from urllib.parse import quote
-from bs4 import BeautifulSoup
-from app.utils.chrome_driver import get_chrome_driver
+from app.models import Property, from_dicts, to_dicts
+from app.utils import cache, driver_pool, fetch, http_client, metrics, normalise, paging, parsing, readiness, timing
+from app.utils.parsing import Field, cls
+
+BASE_URL = os.getenv("HOUSING_BASE_URL", "https://housing.com")
+
+CARD_SELECTOR = "article[data-testid='card-container']"
+
+CARD_SCHEMA = parsing.Schema("//article[@data-testid='card-container']", {
+    "name": Field(f".//h2{cls('T_4d93cd45')}"),
+    "emi": Field(f".//span{cls('_9jtlke')}"),
+    "price": Field(".//div[@data-testid='priceid']"),
+    "link": Field(".//a[@data-q='title'][@href]", attr="href"),
+    # Lazy images keep the real URL in data-src; it is read from the markup rather than
+    # loaded, since the browser blocks images anyway.
+    "image": Field(".//img[@data-src]", attr="data-src"),
+})
+
+LD_JSON = parsing.etree.XPath("//script[@type='application/ld+json']/text()")
+GALLERY_IMAGES = parsing.etree.XPath("(//div[@data-q='gallery'])[1]//img[@src]/@src")
 
 def generate_housing_url(city, locality, page=1):
     city_encoded = quote(city.replace(" ", "_").lower())
     locality_encoded = quote(locality.replace(" ", "_").lower())
-    url = f"https://housing.com/in/buy/{city_encoded}/{locality_encoded}"
+    url = f"{BASE_URL}/in/buy/{city_encoded}/{locality_encoded}"
     if page > 1:
         url += f"?page={page}"
     return url
 
 def extract_lat_lon_second_image(url):
-    response = requests.get(url)
+    metrics.DETAIL_FETCHES.labels("housing").inc()
+    try:
+        response = http_client.get(url)
+    except requests.RequestException as e:
+        metrics.failure("housing", e)
+        return None, None, None
     if response.status_code != 200:
         return None, None, None
-    soup = BeautifulSoup(response.text, 'html.parser')
-    json_script = soup.find("script", {"type": "application/ld+json"})
+    document = parsing.parse_document(response.text)
+    if document is None:
+        return None, None, None
+    json_scripts = LD_JSON(document)
     latitude = longitude = None
-    if json_script:
+    if json_scripts:
         try:
-            json_data = json.loads(json_script.string)
+            json_data = json.loads(json_scripts[0])
             if isinstance(json_data, list):
                 for item in json_data:
                     if "@type" in item and "geo" in item:
@@ -36,79 +61,97 @@ def extract_lat_lon_second_image(url):
         except Exception:
             pass
     second_image = None
-    gallery_section = soup.find("div", {"data-q": "gallery"})
-    if gallery_section:
-        all_images = gallery_section.find_all("img", src=True)
-        if len(all_images) > 1:
-            second_image = all_images[1]["src"]
-            if second_image.startswith("//"):
-                second_image = "https:" + second_image
+    all_images = GALLERY_IMAGES(document)
+    if len(all_images) > 1:
+        second_image = str(all_images[1])
+        if second_image.startswith("//"):
+            second_image = "https:" + second_image
     return latitude, longitude, second_image
 
-def scrape_housing(city: str, locality: str, page: int = 1):
-    properties = []
-    current_site_page = 1
-    while True:
-        url = generate_housing_url(city, locality, current_site_page)
-        driver = get_chrome_driver()
-        driver.get(url)
-        SCROLL_PAUSE_TIME = 2
-        for _ in range(10):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(SCROLL_PAUSE_TIME)
-        driver.execute_script("""
-            let images = document.querySelectorAll('img');
-            images.forEach(img => {
-                if (img.getAttribute('data-src')) {
-                    img.setAttribute('src', img.getAttribute('data-src'));
-                }
-            });
-        """)
-        time.sleep(2)
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        page_properties = []
-        for card in soup.find_all('article', {'data-testid': 'card-container'}):
-            name_tag = card.find('h2', class_='T_4d93cd45')
-            name = name_tag.text if name_tag else None
-            emi_tag = card.find('span', class_='_9jtlke')
-            emi = emi_tag.text if emi_tag else None
-            price_tag = card.find('div', {'data-testid': 'priceid'})
-            price = price_tag.text if price_tag else None
-            link_tag = card.find('a', {'data-q': 'title'}, href=True)
-            link = link_tag['href'] if link_tag else None
-            full_link = f"https://housing.com{link}" if link else None
-            latitude, longitude, image_url = extract_lat_lon_second_image(full_link) if full_link else (None, None, None)
-            if name and full_link:
-                property_details = {
-                    "city": city,
-                    "locality": locality,
-                    "name": name,
-                    "address": None,
-                    "link": full_link,
-                    "price": price,
-                    "perSqftPrice": None,
-                    "emi": emi,
-                    "builtUp": None,
-                    "facing": None,
-                    "apartmentType": None,
-                    "bathrooms": None,
-                    "parking": None,
-                    "image": [image_url] if image_url else None,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "possessionStatus": None,
-                    "possessionDate": None,
-                    "agentName": None,
-                    "description": None,
-                    "source": "housing"
-                }
-                page_properties.append(property_details)
-        driver.quit()
-        if not page_properties:
-            break
-        properties.extend(page_properties)
-        current_site_page += 1
-    page_size = 10
-    start = (page - 1) * page_size
-    end = page * page_size
-    return properties[start:end]
+def fetch_housing_page(city, locality, site_page, use_cache=True, fetch_mode="auto"):
+    return from_dicts(cache.listing_page("housing", city, locality, site_page, lambda: to_dicts(load_housing_page(city, locality, site_page, fetch_mode)), use_cache))
+
+def load_housing_page(city, locality, site_page, fetch_mode="auto"):
+    url = generate_housing_url(city, locality, site_page)
+    return fetch.load(
+        "housing", fetch_mode,
+        lambda: load_housing_page_over_http(url, city, locality),
+        lambda: load_housing_page_in_browser(url, city, locality),
+        # paging.window only asks for later site pages once page 1 had cards, so an
+        # empty one is the end of the results.
+        empty_ok=site_page > 1,
+    )
+
+def load_housing_page_over_http(url, city, locality):
+    with timing.span("page_load", "housing"):
+        page_source = fetch.http_page_source(url)
+    return parse_housing_cards(page_source, city, locality) or parse_housing_ld_json(page_source, city, locality)
+
+def load_housing_page_in_browser(url, city, locality):
+    with driver_pool.checkout("housing") as driver:
+        with timing.span("page_load", "housing"):
+            driver.get(url)
+            cards, waited = readiness.scroll_until_stable(driver, "housing", CARD_SELECTOR, max_scrolls=10)
+        readiness.log_page("housing", url, cards, waited)
+        page_source = driver.page_source
+    return parse_housing_cards(page_source, city, locality)
+
+@timing.span("parse", "housing")
+def parse_housing_cards(page_source, city, locality):
+    page_properties = []
+    for card in CARD_SCHEMA.parse(page_source):
+        full_link = f"{BASE_URL}{card['link']}" if card["link"] else None
+        if card["name"] and full_link:
+            page_properties.append(build_property(city, locality, card["name"], full_link, card["price"], card["emi"], card["image"]))
+    return normalise.normalise_page(page_properties)
+
+@timing.span("parse", "housing")
+def parse_housing_ld_json(page_source, city, locality):
+    # Server-rendered listing pages describe their results as a schema.org ItemList.
+    document = parsing.parse_document(page_source)
+    if document is None:
+        return []
+    page_properties = []
+    for json_script in LD_JSON(document):
+        try:
+            json_data = json.loads(json_script)
+        except ValueError:
+            continue
+        for block in json_data if isinstance(json_data, list) else [json_data]:
+            if not isinstance(block, dict) or block.get("@type") != "ItemList":
+                continue
+            for element in block.get("itemListElement", []):
+                item = element.get("item", element) if isinstance(element, dict) else None
+                if not isinstance(item, dict):
+                    continue
+                name = item.get("name")
+                link = item.get("url")
+                if link and link.startswith("/"):
+                    link = f"{BASE_URL}{link}"
+                offers = item.get("offers") or {}
+                price = offers.get("price") if isinstance(offers, dict) else None
+                if name and link:
+                    page_properties.append(build_property(city, locality, name, link, str(price) if price is not None else None, None))
+    return normalise.normalise_page(page_properties)
+
+def build_property(city, locality, name, full_link, price, emi, image=None):
+    return Property(city=city, locality=locality, name=name, link=full_link, price=price, emi=emi, image=[image] if image else None, source="housing")
+
+@timing.span("enrichment", "housing")
+def enrich_housing(prop, use_cache=True):
+    latitude, longitude, image_url = cache.detail(prop.link, lambda: extract_lat_lon_second_image(prop.link), use_cache)
+    normalise.set_coordinates(prop, latitude, longitude)
+    if image_url:
+        prop.image = [image_url]
+    return prop
+
+def housing_cards(city, locality, page=1, use_cache=True, fetch_mode="auto"):
+    return paging.window(lambda site_page: fetch_housing_page(city, locality, site_page, use_cache, fetch_mode), page)
+
+def iter_housing(city: str, locality: str, page: int = 1, use_cache: bool = True, fetch_mode: str = "auto"):
+    cards = housing_cards(city, locality, page, use_cache, fetch_mode)
+    listings = (prop.to_dict() for prop in http_client.enrich_all(cards, lambda prop: enrich_housing(prop, use_cache)))
+    yield from metrics.count_listings("housing", listings)
+
+def scrape_housing(city: str, locality: str, page: int = 1, use_cache: bool = True, fetch_mode: str = "auto"):
+    return list(iter_housing(city, locality, page, use_cache, fetch_mode))
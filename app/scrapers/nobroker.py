@@ -1,30 +1,53 @@
-import time
 import json
+import os
 import base64
 import requests
-import os
 from urllib.parse import quote
-from bs4 import BeautifulSoup
-from app.utils.chrome_driver import get_chrome_driver
+from app.models import Property, from_dicts, to_dicts
+from app.utils import cache, driver_pool, fetch, geocode, http_client, metrics, normalise, paging, parsing, readiness, timing
+from app.utils.parsing import Field, cls
+
+BASE_URL = os.getenv("NOBROKER_BASE_URL", "https://www.nobroker.in")
+
+CARD_SELECTOR = "div.nb__2_XSE"
+
+# A label's value sits in the nearest div before it in document order, which may be its
+# parent. The sibling and parent lookups cover real cards cheaply; the last alternative
+# walks the whole preceding document and only runs when they find nothing.
+def _labelled(label):
+    label_xpath = f".//div{cls('font-semibold')}[. = '{label}']"
+    return Field((
+        f"({label_xpath}/preceding-sibling::*[descendant-or-self::div][1]/descendant-or-self::div)[last()]",
+        f"{label_xpath}[not(preceding-sibling::*[descendant-or-self::div])]/parent::div",
+        f"({label_xpath}/preceding::div[1] | {label_xpath}/ancestor::div[1])[last()]",
+    ))
+
+CARD_SCHEMA = parsing.Schema(f"//div{cls('nb__2_XSE')}", {
+    "name": Field(f".//h2{cls('heading-6')}"),
+    "address": Field(f".//div{cls('text-gray-light')}"),
+    "link": Field(".//a[@href]", attr="href"),
+    "price": Field(".//div[@class='font-semi-bold heading-6']"),
+    "perSqftPrice": Field(f".//div{cls('heading-7')}"),
+    "emi": Field(f".//div{cls('heading-6')}[@id='roomType']"),
+    "builtUp": Field(f".//div{cls('flex')}[@id='unitCode']"),
+    "facing": Field(f".//div{cls('font-semibold')}"),
+    "apartmentType": _labelled("Apartment Type"),
+    "bathrooms": _labelled("Bathrooms"),
+    "parking": _labelled("Parking"),
+    "image": Field(".//meta[@itemprop='image']", attr="content"),
+})
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+DETAIL_FIELDS = {
+    "latitude": Field("(//span[@itemprop='geo'])[1]//meta[@itemprop='latitude']", attr="content"),
+    "longitude": Field("(//span[@itemprop='geo'])[1]//meta[@itemprop='longitude']", attr="content"),
+}
+
+# Returns the outerHTML of cards from index arguments[1] on, so each scroll step only
+# ships and parses the cards it appended.
+NEW_CARDS_JS = "return Array.from(document.querySelectorAll(arguments[0])).slice(arguments[1]).map(e => e.outerHTML);"
 
 def get_place_details(city, locality):
-    search_query = f"{locality}, {city}"
-    api_url = (
-        "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
-        f"?input={quote(search_query)}&inputtype=textquery&fields=geometry,place_id&key={GOOGLE_API_KEY}"
-    )
-    response = requests.get(api_url)
-    data = response.json()
-    if data["status"] == "OK" and data.get("candidates"):
-        candidate = data["candidates"][0]
-        place_id = candidate.get("place_id")
-        lat = candidate["geometry"]["location"]["lat"]
-        lon = candidate["geometry"]["location"]["lng"]
-        return place_id, lat, lon
-    else:
-        return None, None, None
+    return geocode.resolve(city, locality)
 
 def get_nobroker_url(city, locality):
     place_id, lat, lon = get_place_details(city, locality)
@@ -38,102 +61,133 @@ def get_nobroker_url(city, locality):
     }]
     encoded_search_param = base64.b64encode(json.dumps(search_param_data).encode()).decode()
     base_url = (
-        f"https://www.nobroker.in/property/sale/{quote(city)}/{quote(locality)}"
+        f"{BASE_URL}/property/sale/{quote(city)}/{quote(locality)}"
         f"?searchParam={encoded_search_param}&radius=2.0&city={quote(city)}&locality={quote(locality)}"
     )
     return base_url
 
 def extract_lat_lon_from_nobroker(property_url):
-    response = requests.get(property_url)
+    metrics.DETAIL_FETCHES.labels("nobroker").inc()
+    try:
+        response = http_client.get(property_url)
+    except requests.RequestException as e:
+        metrics.failure("nobroker", e)
+        return None, None
     if response.status_code != 200:
         return None, None
-    soup = BeautifulSoup(response.text, 'html.parser')
-    geo_tag = soup.find("span", itemprop="geo")
-    if geo_tag:
-        latitude_meta = geo_tag.find("meta", itemprop="latitude")
-        longitude_meta = geo_tag.find("meta", itemprop="longitude")
-        if latitude_meta and longitude_meta:
-            return latitude_meta["content"], longitude_meta["content"]
+    detail = parsing.extract(DETAIL_FIELDS, response.text)
+    if detail and detail["latitude"] and detail["longitude"]:
+        return detail["latitude"], detail["longitude"]
     return None, None
 
-def scrape_nobroker(city: str, locality: str, page: int = 1):
+@timing.span("parse", "nobroker")
+def parse_nobroker_cards(page_source, city, locality):
+    return build_nobroker_properties(CARD_SCHEMA.parse(page_source), city, locality)
+
+@timing.span("parse", "nobroker")
+def parse_nobroker_fragments(fragments, city, locality):
+    return build_nobroker_properties(CARD_SCHEMA.parse_fragments(fragments), city, locality)
+
+def build_nobroker_properties(cards, city, locality):
+    page_properties = []
+    for card in cards:
+        if card["name"] and card["address"] and card["link"]:
+            image = f"https://images.nobroker.in/images/{card['image']}" if card["image"] else None
+            page_properties.append(Property(
+                city=city,
+                locality=locality,
+                name=card["name"],
+                address=card["address"],
+                link=f"{BASE_URL}{card['link']}",
+                price=card["price"],
+                perSqftPrice=card["perSqftPrice"],
+                emi=card["emi"],
+                builtUp=card["builtUp"],
+                facing=card["facing"],
+                apartmentType=card["apartmentType"],
+                bathrooms=card["bathrooms"],
+                parking=card["parking"],
+                image=[image] if image else None,
+                source="nobroker",
+            ))
+    return normalise.normalise_page(page_properties)
+
+def fetch_nobroker_cards(city, locality, limit, use_cache=True, fetch_mode="auto"):
+    # The whole scroll is cached as site page 1; a shallower cached scroll is only reused
+    # if it already reached the end of the results.
+    scroll = cache.listing_page(
+        "nobroker", city, locality, 1,
+        lambda: load_nobroker_cards(city, locality, limit, fetch_mode),
+        use_cache,
+        usable=lambda cached: cached["exhausted"] or len(cached["cards"]) >= limit,
+        cacheable=lambda scroll: bool(scroll["cards"]),
+    )
+    return from_dicts(scroll["cards"])
+
+def load_nobroker_cards(city, locality, limit, fetch_mode="auto"):
     url = get_nobroker_url(city, locality)
     if not url:
-        return []
+        return {"cards": [], "exhausted": True}
+    # The server-rendered page only carries the first batch of cards, so in auto mode the
+    # HTTP result is only used when that batch already covers the requested window.
+    scroll = fetch.load(
+        "nobroker", fetch_mode,
+        lambda: {"cards": load_nobroker_cards_over_http(url, city, locality), "exhausted": False},
+        lambda: scroll_nobroker_cards(url, city, locality, limit),
+        enough=lambda scroll: len(scroll["cards"]) >= limit,
+        usable=lambda scroll: bool(scroll["cards"]),
+    )
+    return {"cards": to_dicts(scroll["cards"]), "exhausted": scroll["exhausted"]}
+
+def load_nobroker_cards_over_http(url, city, locality):
+    with timing.span("page_load", "nobroker"):
+        page_source = fetch.http_page_source(url)
+    return parse_nobroker_cards(page_source, city, locality)
+
+def scroll_nobroker_cards(url, city, locality, limit):
+    # NoBroker is a single infinite-scroll page, so keep scrolling only until `limit`
+    # distinct cards are on screen or the page stops growing.
     properties = []
-    driver = get_chrome_driver()
-    driver.get(url)
-    SCROLL_PAUSE_TIME = 2
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    while True:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(SCROLL_PAUSE_TIME)
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        page_properties = []
-        for card in soup.find_all('div', class_='nb__2_XSE'):
-            name_tag = card.find('h2', class_='heading-6')
-            name = name_tag.text if name_tag else None
-            address_tag = card.find('div', class_='text-gray-light')
-            address = address_tag.text if address_tag else None
-            link_tag = card.find('a', href=True)
-            link = link_tag['href'] if link_tag else None
-            price_tag = card.find('div', class_='font-semi-bold heading-6')
-            price = price_tag.text if price_tag else None
-            per_sqft_tag = card.find('div', class_='heading-7')
-            per_sqft_price = per_sqft_tag.text if per_sqft_tag else None
-            emi_tag = card.find('div', class_='heading-6', id='roomType')
-            emi = emi_tag.text if emi_tag else None
-            built_up_tag = card.find('div', class_='flex', id='unitCode')
-            built_up = built_up_tag.text if built_up_tag else None
-            facing_tag = card.find('div', class_='font-semibold')
-            facing = facing_tag.text if facing_tag else None
-            apt_type_label = card.find('div', class_='font-semibold', string='Apartment Type')
-            apartment_type = apt_type_label.find_previous('div').text if apt_type_label else None
-            bathrooms_label = card.find('div', class_='font-semibold', string='Bathrooms')
-            bathrooms = bathrooms_label.find_previous('div').text if bathrooms_label else None
-            parking_label = card.find('div', class_='font-semibold', string='Parking')
-            parking = parking_label.find_previous('div').text if parking_label else None
-            image = None
-            image_meta = card.find('meta', itemprop='image')
-            if image_meta:
-                image_content = image_meta.get('content')
-                image = f"https://images.nobroker.in/images/{image_content}" if image_content else None
-            if name and address and link:
-                full_link = f"https://www.nobroker.in{link}"
-                latitude, longitude = extract_lat_lon_from_nobroker(full_link)
-                property_details = {
-                    "city": city,
-                    "locality": locality,
-                    "name": name,
-                    "address": address,
-                    "link": full_link,
-                    "price": price,
-                    "perSqftPrice": per_sqft_price,
-                    "emi": emi,
-                    "builtUp": built_up,
-                    "facing": facing,
-                    "apartmentType": apartment_type,
-                    "bathrooms": bathrooms,
-                    "parking": parking,
-                    "image": [image] if image else None,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "possessionStatus": None,
-                    "possessionDate": None,
-                    "agentName": None,
-                    "description": None,
-                    "source": "nobroker"
-                }
-                page_properties.append(property_details)
-        if not page_properties:
-            break
-        properties.extend(page_properties)
-    driver.quit()
-    page_size = 10
-    start = (page - 1) * page_size
-    end = page * page_size
-    return properties[start:end]
+    exhausted = False
+    seen_links = set()
+    with driver_pool.checkout("nobroker") as driver:
+        with timing.span("page_load", "nobroker"):
+            driver.get(url)
+            count, waited = readiness.wait_for_cards(driver, "nobroker", CARD_SELECTOR)
+        parsed = 0
+        while True:
+            fragments = driver.execute_script(NEW_CARDS_JS, CARD_SELECTOR, parsed)
+            parsed += len(fragments)
+            for prop in parse_nobroker_fragments(fragments, city, locality):
+                if prop.link not in seen_links:
+                    seen_links.add(prop.link)
+                    properties.append(prop)
+            if len(properties) >= limit:
+                break
+            with timing.span("page_load", "nobroker"):
+                readiness.scroll_to_bottom(driver)
+                new_count, elapsed = readiness.wait_for_growth(driver, "nobroker", CARD_SELECTOR, count)
+            waited += elapsed
+            if new_count <= count:
+                exhausted = True
+                break
+            count = new_count
+        readiness.log_page("nobroker", url, count, waited)
+    return {"cards": properties, "exhausted": exhausted}
+
+@timing.span("enrichment", "nobroker")
+def enrich_nobroker(prop, use_cache=True):
+    latitude, longitude = cache.detail(prop.link, lambda: extract_lat_lon_from_nobroker(prop.link), use_cache)
+    return normalise.set_coordinates(prop, latitude, longitude)
+
+def nobroker_cards(city, locality, page=1, use_cache=True, fetch_mode="auto"):
+    start, end = paging.page_bounds(page)
+    return fetch_nobroker_cards(city, locality, end, use_cache, fetch_mode)[start:end]
+
+def iter_nobroker(city: str, locality: str, page: int = 1, use_cache: bool = True, fetch_mode: str = "auto"):
+    cards = nobroker_cards(city, locality, page, use_cache, fetch_mode)
+    listings = (prop.to_dict() for prop in http_client.enrich_all(cards, lambda prop: enrich_nobroker(prop, use_cache)))
+    yield from metrics.count_listings("nobroker", listings)
+
+def scrape_nobroker(city: str, locality: str, page: int = 1, use_cache: bool = True, fetch_mode: str = "auto"):
+    return list(iter_nobroker(city, locality, page, use_cache, fetch_mode))
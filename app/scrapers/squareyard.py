@@ -1,8 +1,46 @@
-import time
 import json
+import os
 import requests
-from bs4 import BeautifulSoup
-from app.utils.chrome_driver import get_chrome_driver
+from app.models import Property, from_dicts, to_dicts
+from app.utils import cache, driver_pool, fetch, http_client, metrics, normalise, paging, parsing, readiness, timing
+from app.utils.parsing import Field, cls
+
+BASE_URL = os.getenv("SQUAREYARD_BASE_URL", "https://www.squareyards.com")
+
+CARD_SELECTOR = "div.clubListingsItem, div.npListingTile"
+
+def _onclick_link(onclick_value):
+    parts = onclick_value.split("'")
+    return parts[1] if len(parts) > 1 else None
+
+COMMON_FIELDS = {
+    "price": Field(f"(.//div{cls('npListingPrice')})[1]//strong", strip=True),
+    "builtUp": Field(f"(.//li{cls('npListingInfo')})[1]//span", strip=True, index=1),
+    "possessionStatus": Field(f"(.//li{cls('npListingInfo')})[1]//span", strip=True),
+    "description": Field(f"(.//div{cls('npDescBox')})[1]//p", strip=True),
+    "agentName": Field(f"(.//div{cls('npUserName')})[1]//strong", strip=True),
+    "imageSrc": Field(f"(.//img{cls('img-responsive')})[1]", attr="src"),
+    "imageDataSrc": Field(f"(.//img{cls('img-responsive')})[1]", attr="data-src"),
+}
+
+CLUB_SCHEMA = parsing.Schema(f"//div{cls('clubListingsItem')}", {
+    "name": Field(f".//a{cls('strong')}", strip=True),
+    "address": Field(f".//div{cls('npDeveloperLocation')}", strip=True),
+    "link": Field(".//a[@href]", attr="href"),
+    **COMMON_FIELDS,
+})
+
+TILE_SCHEMA = parsing.Schema(f"//div{cls('npListingTile')}", {
+    "name": Field(f".//h2{cls('npListingLink')}", strip=True),
+    "address": Field(f"(.//div{cls('npListingUnit')})[1]//span", strip=True),
+    "link": Field(f"(.//ul{cls('npTagBox')})[1]", attr="onclick", transform=_onclick_link),
+    **COMMON_FIELDS,
+})
+
+DETAIL_FIELDS = {
+    "latitude": Field(f"(//ul[@class='nearLocation scrollBarHide'])[1]//li{cls('locatedLi')}", attr="data-latitude"),
+    "longitude": Field(f"(//ul[@class='nearLocation scrollBarHide'])[1]//li{cls('locatedLi')}", attr="data-longitude"),
+}
 
 def get_lat_lon(details_url):
     headers = {
@@ -10,141 +48,96 @@ def get_lat_lon(details_url):
                        'AppleWebKit/537.36 (KHTML, like Gecko) '
                        'Chrome/91.0.4472.124 Safari/537.36')
     }
-    response = requests.get(details_url, headers=headers)
+    metrics.DETAIL_FETCHES.labels("squareyard").inc()
+    try:
+        response = http_client.get(details_url, headers=headers)
+    except requests.RequestException as e:
+        metrics.failure("squareyard", e)
+        return None, None
     if response.status_code != 200:
         return None, None
-    sp = BeautifulSoup(response.text, 'html.parser')
-    lat, lon = None, None
-    ul = sp.find('ul', class_='nearLocation scrollBarHide')
-    if ul:
-        li = ul.find('li', class_='locatedLi')
-        if li:
-            lat = li.get('data-latitude')
-            lon = li.get('data-longitude')
-    return lat, lon
-
-def scrape_squareyard(city: str, locality: str, page: int = 1):
-    properties = []
-    current_site_page = 1
-    while True:
-        city_slug = city.lower().replace(" ", "-")
-        locality_slug = locality.lower().replace(" ", "-")
-        base_url = f"https://www.squareyards.com/sale/property-for-sale-in-{locality_slug}-{city_slug}"
-        url = base_url if current_site_page == 1 else f"{base_url}?page={current_site_page}"
-        driver = get_chrome_driver()
-        driver.get(url)
-        time.sleep(5)
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        page_properties = []
-        listings = soup.find_all('div', class_='clubListingsItem')
-        for listing in listings:
-            name_tag = listing.find('a', class_='strong')
-            name = name_tag.get_text(strip=True) if name_tag else None
-            location_tag = listing.find('div', class_='npDeveloperLocation')
-            location = location_tag.get_text(strip=True) if location_tag else None
-            type_tag = listing.find('h2', class_='npListingLink')
-            type_name = type_tag.get_text(strip=True) if type_tag else None
-            price_tag = listing.find('div', class_='npListingPrice')
-            price = price_tag.find('strong').get_text(strip=True) if price_tag and price_tag.find('strong') else None
-            built_up_tag = listing.find('li', class_='npListingInfo')
-            built_up_area = built_up_tag.find_all('span')[1].get_text(strip=True) if built_up_tag and len(built_up_tag.find_all('span')) > 1 else None
-            possession_tag = listing.find('li', class_='npListingInfo')
-            possession_status = possession_tag.find('span').get_text(strip=True) if possession_tag and possession_tag.find('span') else None
-            desc_tag = listing.find('div', class_='npDescBox')
-            description = desc_tag.find('p').get_text(strip=True) if desc_tag and desc_tag.find('p') else None
-            agent_tag = listing.find('div', class_='npUserName')
-            agent_name = agent_tag.find('strong').get_text(strip=True) if agent_tag and agent_tag.find('strong') else None
-            img_tag = listing.find('img', class_='img-responsive')
-            image_link = (img_tag.get('src') or img_tag.get('data-src')) if img_tag else None
-            details_link_tag = listing.find('a', href=True)
-            details_link = details_link_tag['href'] if details_link_tag else None
-            property_details = {
-                "city": city,
-                "locality": locality,
-                "name": name,
-                "address": location,
-                "link": details_link,
-                "price": price,
-                "perSqftPrice": None,
-                "emi": None,
-                "builtUp": built_up_area,
-                "facing": None,
-                "apartmentType": None,
-                "bathrooms": None,
-                "parking": None,
-                "image": [image_link] if image_link else None,
-                "latitude": None,
-                "longitude": None,
-                "possessionStatus": possession_status,
-                "possessionDate": None,
-                "agentName": agent_name,
-                "description": description,
-                "source": "squareyard"
-            }
-            page_properties.append(property_details)
-        scrollable_listings = soup.find_all('div', class_='npListingTile')
-        for listing in scrollable_listings:
-            name_tag = listing.find('h2', class_='npListingLink')
-            name = name_tag.get_text(strip=True) if name_tag else None
-            location_tag = listing.find('div', class_='npListingUnit')
-            location = location_tag.find('span').get_text(strip=True) if location_tag and location_tag.find('span') else None
-            price_tag = listing.find('div', class_='npListingPrice')
-            price = price_tag.find('strong').get_text(strip=True) if price_tag and price_tag.find('strong') else None
-            built_up_tag = listing.find('li', class_='npListingInfo')
-            built_up_area = built_up_tag.find_all('span')[1].get_text(strip=True) if built_up_tag and len(built_up_tag.find_all('span')) > 1 else None
-            possession_tag = listing.find('li', class_='npListingInfo')
-            possession_status = possession_tag.find('span').get_text(strip=True) if possession_tag and possession_tag.find('span') else None
-            desc_tag = listing.find('div', class_='npDescBox')
-            description = desc_tag.find('p').get_text(strip=True) if desc_tag and desc_tag.find('p') else None
-            agent_tag = listing.find('div', class_='npUserName')
-            agent_name = agent_tag.find('strong').get_text(strip=True) if agent_tag and agent_tag.find('strong') else None
-            img_tag = listing.find('img', class_='img-responsive')
-            image_link = (img_tag.get('src') or img_tag.get('data-src')) if img_tag else None
-            details_link = None
-            onclick_attr = listing.find('ul', class_='npTagBox')
-            if onclick_attr:
-                onclick_value = onclick_attr.get('onclick')
-                if onclick_value:
-                    parts = onclick_value.split("'")
-                    if len(parts) > 1:
-                        details_link = parts[1]
-            property_details = {
-                "city": city,
-                "locality": locality,
-                "name": name,
-                "address": location,
-                "link": details_link,
-                "price": price,
-                "perSqftPrice": None,
-                "emi": None,
-                "builtUp": built_up_area,
-                "facing": None,
-                "apartmentType": None,
-                "bathrooms": None,
-                "parking": None,
-                "image": [image_link] if image_link else None,
-                "latitude": None,
-                "longitude": None,
-                "possessionStatus": possession_status,
-                "possessionDate": None,
-                "agentName": agent_name,
-                "description": description,
-                "source": "squareyard"
-            }
-            page_properties.append(property_details)
-        driver.quit()
-        if not page_properties:
-            break
-        for prop in page_properties:
-            if prop.get('link'):
-                lat, lon = get_lat_lon(prop['link'])
-            else:
-                lat, lon = None, None
-            prop['latitude'] = lat
-            prop['longitude'] = lon
-        properties.extend(page_properties)
-        current_site_page += 1
-    page_size = 10
-    start = (page - 1) * page_size
-    end = page * page_size
-    return properties[start:end]
+    detail = parsing.extract(DETAIL_FIELDS, response.text)
+    if detail is None:
+        return None, None
+    return detail["latitude"], detail["longitude"]
+
+def squareyard_url(city, locality, site_page=1):
+    city_slug = city.lower().replace(" ", "-")
+    locality_slug = locality.lower().replace(" ", "-")
+    base_url = f"{BASE_URL}/sale/property-for-sale-in-{locality_slug}-{city_slug}"
+    return base_url if site_page == 1 else f"{base_url}?page={site_page}"
+
+def fetch_squareyard_page(city, locality, site_page, use_cache=True, fetch_mode="auto"):
+    return from_dicts(cache.listing_page("squareyard", city, locality, site_page, lambda: to_dicts(load_squareyard_page(city, locality, site_page, fetch_mode)), use_cache))
+
+def load_squareyard_page(city, locality, site_page, fetch_mode="auto"):
+    url = squareyard_url(city, locality, site_page)
+    return fetch.load(
+        "squareyard", fetch_mode,
+        lambda: load_squareyard_page_over_http(url, city, locality),
+        lambda: load_squareyard_page_in_browser(url, city, locality),
+        # paging.window only asks for later site pages once page 1 had cards, so an
+        # empty one is the end of the results.
+        empty_ok=site_page > 1,
+    )
+
+def load_squareyard_page_over_http(url, city, locality):
+    with timing.span("page_load", "squareyard"):
+        page_source = fetch.http_page_source(url)
+    return parse_squareyard_cards(page_source, city, locality)
+
+def load_squareyard_page_in_browser(url, city, locality):
+    with driver_pool.checkout("squareyard") as driver:
+        with timing.span("page_load", "squareyard"):
+            driver.get(url)
+            cards, waited = readiness.wait_for_cards(driver, "squareyard", CARD_SELECTOR)
+        readiness.log_page("squareyard", url, cards, waited)
+        page_source = driver.page_source
+    return parse_squareyard_cards(page_source, city, locality)
+
+@timing.span("parse", "squareyard")
+def parse_squareyard_cards(page_source, city, locality):
+    document = parsing.parse_document(page_source)
+    if document is None:
+        return []
+    cards = [CLUB_SCHEMA.parse_card(card) for card in CLUB_SCHEMA.card_xpath(document)]
+    cards += [TILE_SCHEMA.parse_card(card) for card in TILE_SCHEMA.card_xpath(document)]
+    page_properties = []
+    for card in cards:
+        # A lazy image's src is a data: placeholder until it scrolls into view.
+        image_src = card["imageSrc"] if card["imageSrc"] and not card["imageSrc"].startswith("data:") else None
+        image_link = image_src or card["imageDataSrc"]
+        page_properties.append(Property(
+            city=city,
+            locality=locality,
+            name=card["name"],
+            address=card["address"],
+            link=card["link"],
+            price=card["price"],
+            builtUp=card["builtUp"],
+            image=[image_link] if image_link else None,
+            possessionStatus=card["possessionStatus"],
+            agentName=card["agentName"],
+            description=card["description"],
+            source="squareyard",
+        ))
+    return normalise.normalise_page(page_properties)
+
+@timing.span("enrichment", "squareyard")
+def enrich_squareyard(prop, use_cache=True):
+    if prop.link:
+        lat, lon = cache.detail(prop.link, lambda: get_lat_lon(prop.link), use_cache)
+    else:
+        lat, lon = None, None
+    return normalise.set_coordinates(prop, lat, lon)
+
+def squareyard_cards(city, locality, page=1, use_cache=True, fetch_mode="auto"):
+    return paging.window(lambda site_page: fetch_squareyard_page(city, locality, site_page, use_cache, fetch_mode), page)
+
+def iter_squareyard(city: str, locality: str, page: int = 1, use_cache: bool = True, fetch_mode: str = "auto"):
+    cards = squareyard_cards(city, locality, page, use_cache, fetch_mode)
+    listings = (prop.to_dict() for prop in http_client.enrich_all(cards, lambda prop: enrich_squareyard(prop, use_cache)))
+    yield from metrics.count_listings("squareyard", listings)
+
+def scrape_squareyard(city: str, locality: str, page: int = 1, use_cache: bool = True, fetch_mode: str = "auto"):
+    return list(iter_squareyard(city, locality, page, use_cache, fetch_mode))
@@ -0,0 +1,22 @@
+from app.scrapers import squareyard, nobroker, housing
+
+SOURCES = {
+    "squareyard": squareyard.iter_squareyard,
+    "nobroker": nobroker.iter_nobroker,
+    "housing": housing.iter_housing,
+}
+
+# Site each source scrapes; resilience keys its circuit breakers on the host.
+SOURCE_URLS = {
+    "squareyard": squareyard.BASE_URL,
+    "nobroker": nobroker.BASE_URL,
+    "housing": housing.BASE_URL,
+}
+
+# Unenriched Property cards for one API page, and the detail-page enrichment to apply to
+# each; used where enrichment is decided per listing, like incremental re-crawls.
+CARD_SOURCES = {
+    "squareyard": (squareyard.squareyard_cards, squareyard.enrich_squareyard),
+    "nobroker": (nobroker.nobroker_cards, nobroker.enrich_nobroker),
+    "housing": (housing.housing_cards, housing.enrich_housing),
+}
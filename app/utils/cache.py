@@ -0,0 +1,201 @@
+# app/utils/cache.py
+import contextvars
+import copy
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.utils import metrics
+
+CACHE_DB = os.getenv("CACHE_DB", "scrape_cache.sqlite3")
+LISTING_TTL = float(os.getenv("LISTING_CACHE_TTL", "900"))
+DETAIL_TTL = float(os.getenv("DETAIL_CACHE_TTL", str(7 * 24 * 3600)))
+MEMORY_MAX_ITEMS = int(os.getenv("CACHE_MEMORY_MAX_ITEMS", "2048"))
+DISK_MAX_ITEMS = int(os.getenv("CACHE_DISK_MAX_ITEMS", "200000"))
+
+MISSING = object()
+# Lookups made while handling one request (for its X-Cache-* headers), plus any nested
+# counting() scopes. Pool submissions copy the context, so lookups on worker threads count
+# towards the same request.
+_request_lookups = contextvars.ContextVar("request_lookups", default=())
+
+def _note(name):
+    for lookups in _request_lookups.get():
+        lookups[name] = lookups.get(name, 0) + 1
+
+def make_key(*parts):
+    return "|".join(str(part).strip().lower() for part in parts)
+
+class MemoryCache:
+    def __init__(self, max_items=MEMORY_MAX_ITEMS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return MISSING
+            value, expires = entry
+            if expires < time.time():
+                del self._items[key]
+                return MISSING
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._items[key] = (value, expires)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+class DiskCache:
+    def __init__(self, path=CACHE_DB, max_items=DISK_MAX_ITEMS):
+        self.max_items = max_items
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return MISSING, None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return MISSING, None
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires, time.time()),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count > self.max_items:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (count - self.max_items,),
+                )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+class TieredCache:
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+            _note(name)
+        metrics.CACHE_LOOKUPS.labels(name).inc()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count("memory_hits")
+            return copy.deepcopy(value)
+        value, expires = self.disk.get(key)
+        if value is not MISSING:
+            self._count("disk_hits")
+            self.memory.set(key, value, expires)
+            return copy.deepcopy(value)
+        self._count("misses")
+        return MISSING
+
+    def set(self, key, value, ttl):
+        expires = time.time() + ttl
+        self.memory.set(key, copy.deepcopy(value), expires)
+        self.disk.set(key, value, expires)
+
+    def get_or_set(self, key, ttl, compute, use_cache=True, cacheable=bool, usable=None):
+        # With use_cache=False the stored value is ignored but still refreshed.
+        if use_cache:
+            value = self.get(key)
+            if value is not MISSING and (usable is None or usable(value)):
+                return value
+        value = compute()
+        _note("computed")
+        if cacheable(value):
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        with self._stats_lock:
+            return _with_ratio(dict(self._stats))
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+def _with_ratio(stats):
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+    return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def tiered():
+    # Opened on first use so that importing the app doesn't create CACHE_DB.
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TieredCache(MemoryCache(), DiskCache())
+        return _cache
+
+def start_request():
+    lookups = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+    _request_lookups.set((lookups,))
+    return lookups
+
+def request_stats():
+    # This request's lookups so far; all zero outside a request.
+    scopes = _request_lookups.get()
+    lookups = scopes[0] if scopes else {}
+    return _with_ratio({name: lookups.get(name, 0) for name in ("memory_hits", "disk_hits", "misses")})
+
+@contextmanager
+def counting():
+    # Counts the lookups made inside the block, and under "computed" how many values had
+    # to be fetched rather than served from the cache.
+    lookups = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "computed": 0}
+    token = _request_lookups.set(_request_lookups.get() + (lookups,))
+    try:
+        yield lookups
+    finally:
+        _request_lookups.reset(token)
+
+def listing_page(source, city, locality, site_page, compute, use_cache=True, usable=None, cacheable=bool):
+    key = make_key("listing", source, city, locality, site_page)
+    return tiered().get_or_set(key, LISTING_TTL, compute, use_cache, cacheable=cacheable, usable=usable)
+
+def detail(url, compute, use_cache=True):
+    # Failed fetches come back as all-None tuples; don't pin those for a week.
+    return tiered().get_or_set(f"detail|{url}", DETAIL_TTL, compute, use_cache, cacheable=lambda value: any(v is not None for v in value))
+
+def stats():
+    return tiered().stats()
@@ -0,0 +1,188 @@
+# app/utils/changes.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.utils import http_client, metrics
+
+CHANGES_DB = os.getenv("CHANGES_DB", "scrape_changes.sqlite3")
+
+# Card fields that make up a listing's fingerprint. Coordinates and images are left out:
+# they come from the detail page (or rotate with CDN tokens) and would make every listing
+# look changed.
+FINGERPRINT_FIELDS = (
+    "name", "address", "price", "perSqftPrice", "emi", "builtUp", "facing", "apartmentType",
+    "bathrooms", "parking", "possessionStatus", "possessionDate", "agentName", "description",
+)
+
+def fingerprint(card):
+    content = json.dumps([getattr(card, field) for field in FINGERPRINT_FIELDS], separators=(",", ":"))
+    return hashlib.sha1(content.encode()).hexdigest()
+
+def changed_fields(previous, card):
+    return {
+        field: {"old": previous.get(field), "new": getattr(card, field)}
+        for field in FINGERPRINT_FIELDS
+        if previous.get(field) != getattr(card, field)
+    }
+
+def _normalise(value):
+    return str(value).strip().lower()
+
+class ListingTracker:
+    # Last-seen state of every listing, keyed by source and link. Listings are scoped to the
+    # source/city/locality they were last crawled in; "removed" is judged against that
+    # whole scope, since one new listing shifts every later one down a page. page is just
+    # where the listing was last seen.
+    def __init__(self, path=CHANGES_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS listings ("
+                "source TEXT NOT NULL, link TEXT NOT NULL, city TEXT NOT NULL, locality TEXT NOT NULL, "
+                "page INTEGER NOT NULL, fingerprint TEXT NOT NULL, listing TEXT NOT NULL, "
+                "first_seen REAL NOT NULL, last_seen REAL NOT NULL, PRIMARY KEY (source, link))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS listings_scope ON listings (source, city, locality, page)")
+
+    def known(self, source, links):
+        # {link: (fingerprint, listing)} for the links already tracked.
+        known = {}
+        links = list(links)
+        with self._lock:
+            for offset in range(0, len(links), 500):
+                chunk = links[offset:offset + 500]
+                rows = self._conn.execute(
+                    f"SELECT link, fingerprint, listing FROM listings WHERE source = ? AND link IN ({','.join('?' * len(chunk))})",
+                    [source] + chunk,
+                ).fetchall()
+                known.update((link, (digest, json.loads(listing))) for link, digest, listing in rows)
+        return known
+
+    def sweep(self, source, city, locality, since, pages=None):
+        """Drop and return the listings of a scope not seen since a full crawl of it began.
+
+        pages limits the sweep to listings last seen within the pages that crawl covered.
+        Nothing is dropped if the crawl saw no listing at all, which is taken as a failed
+        load rather than the locality emptying out.
+        """
+        city, locality = _normalise(city), _normalise(locality)
+        scope = "source = ? AND city = ? AND locality = ?"
+        params = [source, city, locality]
+        if pages is not None:
+            scope += " AND page <= ?"
+            params.append(pages)
+        with self._lock, self._conn:
+            seen = self._conn.execute(f"SELECT 1 FROM listings WHERE {scope} AND last_seen >= ? LIMIT 1", params + [since]).fetchone()
+            if seen is None:
+                return {}
+            rows = self._conn.execute(f"SELECT link, listing FROM listings WHERE {scope} AND last_seen < ?", params + [since]).fetchall()
+            self._conn.executemany(
+                "DELETE FROM listings WHERE source = ? AND link = ?",
+                [(source, link) for link, _ in rows],
+            )
+        return {link: json.loads(listing) for link, listing in rows}
+
+    def last_crawled(self, source, city, locality, page):
+        # When this scope was last crawled, or None if it never was.
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(last_seen) FROM listings WHERE source = ? AND city = ? AND locality = ? AND page = ?",
+                (source, _normalise(city), _normalise(locality), page),
+            ).fetchone()
+        return row[0]
+
+    def update(self, source, city, locality, page, stored, touched):
+        # stored: (link, fingerprint, listing) for new or changed listings; touched: links
+        # seen unchanged.
+        now = time.time()
+        city, locality = _normalise(city), _normalise(locality)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO listings (source, link, city, locality, page, fingerprint, listing, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (source, link) DO UPDATE SET "
+                "city = excluded.city, locality = excluded.locality, page = excluded.page, "
+                "fingerprint = excluded.fingerprint, listing = excluded.listing, last_seen = excluded.last_seen",
+                [(source, link, city, locality, page, digest, json.dumps(listing), now, now) for link, digest, listing in stored],
+            )
+            self._conn.executemany(
+                "UPDATE listings SET city = ?, locality = ?, page = ?, last_seen = ? WHERE source = ? AND link = ?",
+                [(city, locality, page, now, source, link) for link in touched],
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM listings")
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def tracker():
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ListingTracker()
+        return _tracker
+
+def recrawl(source, city, locality, page, cards, enrich):
+    """Compare a fresh crawl of one page with what was seen last time.
+
+    Only new and changed listings go through enrich (the detail-page fetch); unchanged
+    ones are just marked as seen. "removed" is left empty: a listing missing from one
+    page has usually just moved to another, so removals come from sweep() once every
+    page of the scope has been crawled.
+    """
+    cards = list({card.link: card for card in cards if card.link}.values())
+    seen = tracker()
+    known = seen.known(source, (card.link for card in cards))
+    fresh, touched, changes = [], [], {}
+    for card in cards:
+        digest = fingerprint(card)
+        previous = known.get(card.link)
+        if previous is not None and previous[0] == digest:
+            touched.append(card.link)
+            continue
+        if previous is not None:
+            changes[card.link] = changed_fields(previous[1], card)
+        fresh.append((digest, card))
+    enriched = [prop.to_dict() for prop in http_client.enrich_all([card for _, card in fresh], enrich)]
+    stored = [(listing["link"], digest, listing) for (digest, _), listing in zip(fresh, enriched)]
+    seen.update(source, city, locality, page, stored, touched)
+
+    added = [listing for listing in enriched if listing["link"] not in changes]
+    changed = [{"listing": listing, "changes": changes[listing["link"]]} for listing in enriched if listing["link"] in changes]
+    for change, count in (("added", len(added)), ("changed", len(changed)), ("unchanged", len(touched))):
+        metrics.LISTING_CHANGES.labels(source, change).inc(count)
+    return {
+        "source": source,
+        "city": city,
+        "locality": locality,
+        "page": page,
+        "added": added,
+        "changed": changed,
+        "removed": [],
+        "unchanged": len(touched),
+    }
+
+def sweep(source, city, locality, since, pages=None):
+    """Listings of a scope that dropped out of the full crawl started at since."""
+    removed = list(tracker().sweep(source, city, locality, since, pages).values())
+    metrics.LISTING_CHANGES.labels(source, "removed").inc(len(removed))
+    return removed
+
+def recrawl_pages(source, city, locality, pages, cards, enrich):
+    """recrawl() pages 1..pages of a scope in turn, then sweep() it; one combined delta."""
+    started = time.time()
+    delta = {"source": source, "city": city, "locality": locality, "pages": pages,
+             "added": [], "changed": [], "removed": [], "unchanged": 0}
+    for page in range(1, pages + 1):
+        page_delta = recrawl(source, city, locality, page, cards(page), enrich)
+        delta["added"] += page_delta["added"]
+        delta["changed"] += page_delta["changed"]
+        delta["unchanged"] += page_delta["unchanged"]
+    delta["removed"] = sweep(source, city, locality, started, pages)
+    return delta
@@ -0,0 +1,102 @@
+# app/utils/columnar.py
+"""Column-oriented export of listings for analytics jobs.
+
+NumPy and pyarrow are optional; install whichever the consumer needs.
+
+    python -m app.utils.columnar listings.parquet --city Delhi --since 1700000000
+    python -m app.utils.columnar listings.npz --source housing
+"""
+import argparse
+import sys
+from app.models import FIELDS, Property
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+INTEGER_COLUMNS = ("priceInr", "perSqftPriceInr", "emiInr")
+FLOAT_COLUMNS = ("builtUpSqft", "latitude", "longitude", "scrapedAt")
+LIST_COLUMNS = ("image",)
+
+class MissingDependency(RuntimeError):
+    pass
+
+def _require(module, name):
+    if module is None:
+        raise MissingDependency(f"{name} is not installed; pip install {name}")
+
+def to_columns(listings, columns=FIELDS):
+    # Accepts Property objects or listing dicts.
+    rows = [listing.to_dict() if isinstance(listing, Property) else listing for listing in listings]
+    return {column: [row.get(column) for row in rows] for column in columns}
+
+def to_numpy(listings, columns=FIELDS):
+    # Numeric columns become float64 with NaN for missing values (so prices are float64
+    # too); everything else is an object array.
+    _require(np, "numpy")
+    arrays = {}
+    for column, values in to_columns(listings, columns).items():
+        if column in INTEGER_COLUMNS or column in FLOAT_COLUMNS:
+            arrays[column] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            arrays[column] = np.array(values, dtype=object)
+    return arrays
+
+def to_arrow(listings, columns=FIELDS):
+    _require(pa, "pyarrow")
+    types = {}
+    for column in columns:
+        if column in INTEGER_COLUMNS:
+            types[column] = pa.int64()
+        elif column in FLOAT_COLUMNS:
+            types[column] = pa.float64()
+        elif column in LIST_COLUMNS:
+            types[column] = pa.list_(pa.string())
+        else:
+            types[column] = pa.string()
+    data = to_columns(listings, columns)
+    return pa.table({column: pa.array(values, type=types[column]) for column, values in data.items()})
+
+def write_parquet(listings, path, columns=FIELDS):
+    table = to_arrow(listings, columns)
+    pq.write_table(table, path, compression="zstd")
+
+def write_npz(listings, path, columns=FIELDS):
+    arrays = to_numpy(listings, columns)
+    np.savez_compressed(path, **arrays)
+
+def main(argv=None):
+    from app.utils import history
+    parser = argparse.ArgumentParser(description="Export stored listing snapshots as Parquet (.parquet) or NumPy (.npz) columns.")
+    parser.add_argument("path", help="Output file; the extension picks the format")
+    parser.add_argument("--source")
+    parser.add_argument("--city")
+    parser.add_argument("--locality")
+    parser.add_argument("--since", type=float, help="Unix timestamp, inclusive")
+    parser.add_argument("--until", type=float, help="Unix timestamp, exclusive")
+    parser.add_argument("--limit", type=int, default=1000, help="Most recent snapshots to export")
+    args = parser.parse_args(argv)
+    if not args.path.endswith((".parquet", ".npz")):
+        parser.error("path must end in .parquet or .npz")
+    snapshots = history.query(args.source, args.city, args.locality, args.since, args.until, args.limit)
+    listings = [dict(listing, scrapedAt=snapshot["scrapedAt"]) for snapshot in snapshots for listing in snapshot["listings"]]
+    columns = FIELDS + ("scrapedAt",)
+    try:
+        if args.path.endswith(".parquet"):
+            write_parquet(listings, args.path, columns)
+        else:
+            write_npz(listings, args.path, columns)
+    except MissingDependency as e:
+        parser.error(str(e))
+    print({"snapshots": len(snapshots), "listings": len(listings), "path": args.path})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
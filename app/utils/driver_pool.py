@@ -0,0 +1,153 @@
+# app/utils/driver_pool.py
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from selenium.common.exceptions import WebDriverException
+from app.utils import metrics, ratelimit, timing
+from app.utils.chrome_driver import get_chrome_driver, get_profile
+
+MAX_BROWSERS = int(os.getenv("DRIVER_POOL_SIZE", "3"))
+MAX_PAGE_LOADS = int(os.getenv("DRIVER_MAX_PAGE_LOADS", "25"))
+CHECKOUT_TIMEOUT = float(os.getenv("DRIVER_CHECKOUT_TIMEOUT", "120"))
+
+class PoolExhausted(RuntimeError):
+    pass
+
+class PooledDriver:
+    def __init__(self, driver, profile):
+        self.driver = driver
+        self.profile = profile.name
+        self.launch_key = profile.launch_key
+        self.page_loads = 0
+        self.broken = False
+
+    def get(self, url):
+        self.page_loads += 1
+        ratelimit.acquire(url)
+        return self.driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def is_healthy(self):
+        if self.broken:
+            return False
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except WebDriverException:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+
+def _describe(launch_key):
+    block, (width, height), extra_args = launch_key
+    return " ".join([f"{width}x{height}", "block=" + (",".join(block) or "none")] + list(extra_args))
+
+class DriverPool:
+    # Idle browsers are kept per launch configuration (BrowserProfile.launch_key), since a
+    # browser's blocking rules and window are fixed at launch; profiles with the same
+    # settings share browsers. max_browsers bounds live browsers across configurations:
+    # starting one with nothing idle that fits retires an idle browser of another.
+    def __init__(self, max_browsers=MAX_BROWSERS, max_page_loads=MAX_PAGE_LOADS, factory=get_chrome_driver):
+        self.max_browsers = max_browsers
+        self.max_page_loads = max_page_loads
+        self.factory = factory
+        self._slots = threading.BoundedSemaphore(max_browsers)
+        self._idle = {}
+        self._live = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _retire(self, pooled):
+        with self._lock:
+            self._live -= 1
+        pooled.quit()
+
+    def _acquire(self, profile, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolExhausted(f"No browser became available within {timeout}s")
+        try:
+            while True:
+                evicted = None
+                with self._lock:
+                    idle = self._idle.get(profile.launch_key)
+                    pooled = idle.pop() if idle else None
+                    if pooled is None:
+                        if self._live >= self.max_browsers:
+                            evicted = next((drivers.pop(0) for drivers in self._idle.values() if drivers), None)
+                            if evicted is not None:
+                                # Uncounted here rather than in _retire, so no other
+                                # acquirer sees the pool full with nothing idle to evict.
+                                self._live -= 1
+                        self._live += 1
+                if evicted is not None:
+                    evicted.quit()
+                if pooled is None:
+                    try:
+                        with timing.span("browser_start"):
+                            pooled = PooledDriver(self.factory(profile), profile)
+                    except Exception:
+                        with self._lock:
+                            self._live -= 1
+                        raise
+                    metrics.BROWSERS_LAUNCHED.inc()
+                    return pooled
+                if pooled.is_healthy():
+                    return pooled
+                self._retire(pooled)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, pooled):
+        try:
+            keep = not self._closed and pooled.page_loads < self.max_page_loads and pooled.is_healthy()
+            if keep:
+                try:
+                    pooled.driver.get("about:blank")
+                except WebDriverException:
+                    keep = False
+            if keep:
+                with self._lock:
+                    self._idle.setdefault(pooled.launch_key, []).append(pooled)
+            else:
+                self._retire(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def checkout(self, profile=None, timeout=CHECKOUT_TIMEOUT):
+        pooled = self._acquire(get_profile(profile), timeout)
+        try:
+            yield pooled
+        except WebDriverException as e:
+            pooled.broken = True
+            metrics.failure("browser", e)
+            raise
+        finally:
+            self._release(pooled)
+
+    def stats(self):
+        with self._lock:
+            idle = {_describe(key): len(drivers) for key, drivers in self._idle.items()}
+            live = self._live
+        return {"max_browsers": self.max_browsers, "live": live, "idle": idle}
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for drivers in idle.values():
+            for pooled in drivers:
+                self._retire(pooled)
+
+pool = DriverPool()
+atexit.register(pool.close)
+
+def checkout(profile=None, timeout=CHECKOUT_TIMEOUT):
+    return pool.checkout(profile, timeout)
@@ -0,0 +1,90 @@
+# app/utils/fetch.py
+import logging
+import os
+import threading
+import time
+import requests
+from app.utils import http_client, metrics
+
+logger = logging.getLogger(__name__)
+
+FETCH_MODES = ("auto", "http", "browser")
+HTTP_FAILURE_LIMIT = int(os.getenv("HTTP_FETCH_FAILURE_LIMIT", "3"))
+HTTP_RETRY_AFTER = float(os.getenv("HTTP_FETCH_RETRY_AFTER", "1800"))
+
+BROWSER_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                   'AppleWebKit/537.36 (KHTML, like Gecko) '
+                   'Chrome/124.0.0.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-IN,en;q=0.9',
+}
+
+class AutoSelector:
+    # Remembers per source whether the plain-HTTP path has been yielding cards. After
+    # HTTP_FAILURE_LIMIT misses in a row auto mode goes straight to the browser, and
+    # probes HTTP again once HTTP_RETRY_AFTER has passed.
+    def __init__(self, failure_limit=HTTP_FAILURE_LIMIT, retry_after=HTTP_RETRY_AFTER):
+        self.failure_limit = failure_limit
+        self.retry_after = retry_after
+        self._failures = {}
+        self._disabled_until = {}
+        self._lock = threading.Lock()
+
+    def try_http(self, source):
+        with self._lock:
+            return self._disabled_until.get(source, 0) <= time.time()
+
+    def record(self, source, ok):
+        with self._lock:
+            if ok:
+                self._failures[source] = 0
+                self._disabled_until.pop(source, None)
+                return
+            failures = self._failures[source] = self._failures.get(source, 0) + 1
+            if failures >= self.failure_limit:
+                self._disabled_until[source] = time.time() + self.retry_after
+                self._failures[source] = 0
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {source: {"httpDisabledFor": round(until - now, 1)} for source, until in self._disabled_until.items() if until > now}
+
+selector = AutoSelector()
+
+def http_page_source(url):
+    response = http_client.get(url, headers=BROWSER_HEADERS)
+    response.raise_for_status()
+    return response.text
+
+def load(source, mode, http_loader, browser_loader, enough=bool, empty_ok=False, usable=bool):
+    # Only an exception or an unusable HTTP result (no cards) counts as a miss. A usable
+    # one that isn't enough for this request (say a window past the server-rendered
+    # batch) falls back to the browser without counting against HTTP.
+    # empty_ok: an empty HTTP result is a real answer, e.g. a site page past the end of
+    # the results, so it neither falls back to the browser nor counts as a miss.
+    if mode not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch mode: {mode}")
+    if mode == "browser":
+        return browser_loader()
+    if mode == "http":
+        return http_loader()
+    if selector.try_http(source):
+        try:
+            result = http_loader()
+        except requests.RequestException as e:
+            metrics.failure(source, e)
+            logger.info("%s http fetch failed, falling back to browser: %s", source, e)
+            result = None
+        if empty_ok and result is not None and not result:
+            return result
+        if result is None or not usable(result):
+            selector.record(source, False)
+        elif enough(result):
+            selector.record(source, True)
+            return result
+    return browser_loader()
+
+def stats():
+    return selector.stats()
@@ -0,0 +1,171 @@
+# app/utils/geocode.py
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import quote
+from app.utils import http_client, timing
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GEOCODE_DB = os.getenv("GEOCODE_DB", "geocode.sqlite3")
+# Ships with just its header: rows are real place ids resolved outside the API, added per
+# deployment (see the seed command).
+GEOCODE_SEED = os.getenv("GEOCODE_SEED", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "geocode_seed.csv"))
+# "google" resolves misses through the Places API, "stub" answers them locally with
+# deterministic fake places so the NoBroker path can run without network access. Stub
+# places only live in memory; they would build bogus NoBroker URLs if a later "google"
+# run found them in GEOCODE_DB.
+GEOCODE_MODE = os.getenv("GEOCODE_MODE", "google")
+
+def place_key(city, locality):
+    return f"{city.strip().lower()}|{locality.strip().lower()}"
+
+def find_place(city, locality):
+    search_query = f"{locality}, {city}"
+    api_url = (
+        "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
+        f"?input={quote(search_query)}&inputtype=textquery&fields=geometry,place_id&key={GOOGLE_API_KEY}"
+    )
+    response = http_client.get(api_url)
+    data = response.json()
+    if data["status"] == "OK" and data.get("candidates"):
+        candidate = data["candidates"][0]
+        place_id = candidate.get("place_id")
+        lat = candidate["geometry"]["location"]["lat"]
+        lon = candidate["geometry"]["location"]["lng"]
+        return place_id, lat, lon
+    else:
+        return None, None, None
+
+def stub_place(city, locality):
+    digest = hashlib.sha1(place_key(city, locality).encode()).hexdigest()
+    lat = 8 + int(digest[:8], 16) / 0xFFFFFFFF * 27
+    lon = 68 + int(digest[8:16], 16) / 0xFFFFFFFF * 29
+    return f"stub_{digest[:20]}", round(lat, 6), round(lon, 6)
+
+class GeocodeCache:
+    def __init__(self, path=GEOCODE_DB, mode=GEOCODE_MODE):
+        self.mode = mode
+        self._memory = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                "key TEXT PRIMARY KEY, city TEXT NOT NULL, locality TEXT NOT NULL, place_id TEXT NOT NULL, "
+                "lat REAL NOT NULL, lon REAL NOT NULL, origin TEXT NOT NULL, resolved_at REAL NOT NULL)"
+            )
+            # Earlier versions persisted stub places alongside real ones.
+            self._conn.execute("DELETE FROM places WHERE origin = 'stub'")
+
+    def get(self, city, locality):
+        key = place_key(city, locality)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+            row = self._conn.execute("SELECT place_id, lat, lon FROM places WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._memory[key] = row
+            return row
+
+    def put(self, city, locality, place_id, lat, lon, origin, replace=True):
+        key = place_key(city, locality)
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"{verb} INTO places (key, city, locality, place_id, lat, lon, origin, resolved_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, city, locality, place_id, float(lat), float(lon), origin, time.time()),
+            )
+            self._memory.pop(key, None)
+
+    @timing.span("geocode")
+    def lookup(self, city, locality):
+        return stub_place(city, locality) if self.mode == "stub" else find_place(city, locality)
+
+    def resolve(self, city, locality):
+        cached = self.get(city, locality)
+        if cached:
+            return tuple(cached)
+        # Concurrent requests for the same locality share one upstream lookup.
+        key = place_key(city, locality)
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait()
+            cached = self.get(city, locality)
+            return tuple(cached) if cached else (None, None, None)
+        try:
+            place_id, lat, lon = self.lookup(city, locality)
+            if place_id and self.mode == "stub":
+                with self._lock:
+                    self._memory[key] = (place_id, lat, lon)
+            elif place_id:
+                self.put(city, locality, place_id, lat, lon, self.mode)
+            return place_id, lat, lon
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def seed(self, path, replace=False):
+        count = 0
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("place_id") and row.get("lat") and row.get("lon"):
+                    self.put(row["city"], row["locality"], row["place_id"], row["lat"], row["lon"], "seed", replace)
+                    count += 1
+        return count
+
+    def preload(self, path):
+        resolved = skipped = failed = 0
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                city, locality = row["city"], row["locality"]
+                if self.get(city, locality):
+                    skipped += 1
+                elif self.resolve(city, locality)[0]:
+                    resolved += 1
+                else:
+                    failed += 1
+        return {"resolved": resolved, "cached": skipped, "failed": failed}
+
+_places = None
+_places_lock = threading.Lock()
+
+def places():
+    global _places
+    with _places_lock:
+        if _places is None:
+            _places = GeocodeCache()
+            if os.path.exists(GEOCODE_SEED):
+                _places.seed(GEOCODE_SEED)
+    return _places
+
+def resolve(city, locality):
+    return places().resolve(city, locality)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the locality geocode cache used by the NoBroker scraper.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    preload = commands.add_parser("preload", help="Resolve every city,locality row of a CSV that is not cached yet")
+    preload.add_argument("csv_path")
+    seed = commands.add_parser("seed", help="Import city,locality,place_id,lat,lon rows without calling Google")
+    seed.add_argument("csv_path")
+    seed.add_argument("--replace", action="store_true", help="Overwrite localities that are already cached")
+    args = parser.parse_args(argv)
+    if args.command == "preload":
+        print(places().preload(args.csv_path))
+    else:
+        print({"seeded": places().seed(args.csv_path, args.replace)})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# app/utils/history.py
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from app.utils import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB = os.getenv("HISTORY_DB", "scrape_history.sqlite3")
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "1000"))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "2"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "200"))
+
+# Queued by flush() to make the writer commit its batch without waiting out the interval.
+_FLUSH = object()
+
+def _normalise(value):
+    return str(value).strip().lower()
+
+class HistoryStore:
+    # Append-only snapshots of scrape results, one row per source/city/locality/page run,
+    # with the listings stored as zlib-compressed JSON.
+    def __init__(self, path=HISTORY_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "id INTEGER PRIMARY KEY, source TEXT NOT NULL, city TEXT NOT NULL, locality TEXT NOT NULL, "
+                "page INTEGER NOT NULL, scraped_at REAL NOT NULL, listings INTEGER NOT NULL, payload BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS snapshots_lookup ON snapshots (source, city, locality, scraped_at)"
+            )
+
+    def insert_many(self, records):
+        rows = [
+            (source, _normalise(city), _normalise(locality), page, scraped_at, len(listings),
+             zlib.compress(json.dumps(listings).encode()))
+            for source, city, locality, page, scraped_at, listings in records
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO snapshots (source, city, locality, page, scraped_at, listings, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def query(self, source=None, city=None, locality=None, since=None, until=None, limit=10, include_listings=True):
+        clauses, params = [], []
+        for column, value in (("source", source), ("city", city), ("locality", locality)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value if column == "source" else _normalise(value))
+        if since is not None:
+            clauses.append("scraped_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("scraped_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = "id, source, city, locality, page, scraped_at, listings" + (", payload" if include_listings else "")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM snapshots {where} ORDER BY scraped_at DESC, id DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        snapshots = []
+        for row in rows:
+            snapshot = {
+                "id": row[0],
+                "source": row[1],
+                "city": row[2],
+                "locality": row[3],
+                "page": row[4],
+                "scrapedAt": row[5],
+                "count": row[6],
+            }
+            if include_listings:
+                snapshot["listings"] = json.loads(zlib.decompress(row[7]))
+            snapshots.append(snapshot)
+        return snapshots
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class HistoryWriter:
+    # Keeps disk writes off the request path: record() only enqueues, and a daemon thread
+    # bulk-inserts whatever has accumulated every flush interval or batch size.
+    def __init__(self, store_factory=HistoryStore, queue_size=HISTORY_QUEUE_SIZE, flush_interval=HISTORY_FLUSH_INTERVAL, batch_size=HISTORY_BATCH_SIZE):
+        self.store_factory = store_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._store = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "batches": 0}
+
+    @property
+    def store(self):
+        with self._lock:
+            if self._store is None:
+                self._store = self.store_factory()
+            return self._store
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def record(self, source, city, locality, page, listings):
+        self._start()
+        try:
+            self._queue.put_nowait((source, city, locality, page, time.time(), list(listings)))
+        except queue.Full:
+            # Persistence is best-effort; a backed-up disk must not stall scraping.
+            with self._lock:
+                self._stats["dropped"] += 1
+            logger.warning("history queue full, dropping %s snapshot for %s/%s", source, city, locality)
+            return False
+        with self._lock:
+            self._stats["recorded"] += 1
+        return True
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            with timing.span("persist"):
+                self.store.insert_many(batch)
+        except sqlite3.Error as e:
+            metrics.failure("history", e)
+            logger.warning("failed to persist %d snapshots: %s", len(batch), e)
+        else:
+            with self._lock:
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self):
+        while True:
+            batch = []
+            item = self._queue.get()
+            # Snapshots pile up until the flush interval has passed since the first one or a
+            # full batch is ready, so they share one transaction; flush() cuts the wait short.
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _FLUSH:
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(batch)
+            if item is _FLUSH:
+                self._queue.task_done()
+
+    def flush(self):
+        # Has the background thread write whatever it holds or is queued, and waits for it.
+        with self._lock:
+            if self._thread is None:
+                return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def query(self, **filters):
+        return self.store.query(**filters)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+writer = HistoryWriter()
+atexit.register(writer.flush)
+
+def record(source, city, locality, page, listings):
+    return writer.record(source, city, locality, page, listings)
+
+def query(source=None, city=None, locality=None, since=None, until=None, limit=10, include_listings=True):
+    return writer.query(source=source, city=city, locality=locality, since=since, until=until, limit=limit, include_listings=include_listings)
+
+def flush():
+    writer.flush()
+
+def stats():
+    return writer.stats()
@@ -0,0 +1,64 @@
+# app/utils/http_client.py
+import contextvars
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.utils import ratelimit
+
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "16"))
+PER_DOMAIN_CONCURRENCY = int(os.getenv("PER_DOMAIN_CONCURRENCY", "4"))
+
+def _build_session():
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+session = _build_session()
+
+_domain_slots = {}
+_domain_slots_lock = threading.Lock()
+
+def domain_slot(url):
+    host = urlparse(url).netloc
+    with _domain_slots_lock:
+        slot = _domain_slots.get(host)
+        if slot is None:
+            slot = _domain_slots[host] = threading.BoundedSemaphore(PER_DOMAIN_CONCURRENCY)
+    return slot
+
+def get(url, **kwargs):
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    ratelimit.acquire(url)
+    with domain_slot(url):
+        return session.get(url, **kwargs)
+
+_executor = ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix="enrich")
+
+def enrich_all(items, enrich):
+    # Fan detail fetches out as listings arrive, but hand them back in listing order.
+    pending = deque()
+    for item in items:
+        pending.append(_executor.submit(contextvars.copy_context().run, enrich, item))
+        while pending and pending[0].done():
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,253 @@
+# app/utils/merge.py
+import itertools
+import math
+import os
+import re
+from difflib import SequenceMatcher
+from app.utils.normalise import parse_area, parse_coordinate, parse_price
+
+MERGE_DISTANCE_METERS = float(os.getenv("MERGE_DISTANCE_METERS", "150"))
+MERGE_NAME_SIMILARITY = float(os.getenv("MERGE_NAME_SIMILARITY", "0.6"))
+MERGE_PRICE_TOLERANCE = float(os.getenv("MERGE_PRICE_TOLERANCE", "0.15"))
+MERGE_AREA_TOLERANCE = float(os.getenv("MERGE_AREA_TOLERANCE", "0.1"))
+# Candidates looked at per listing. Only reached in dense pockets of listings in the same
+# price band (typically sharing a generic name), and keeps merge near-linear there.
+MERGE_MAX_CANDIDATES = int(os.getenv("MERGE_MAX_CANDIDATES", "200"))
+
+# Earlier sources win when merged listings disagree on a field.
+SOURCE_PRIORITY = ("squareyard", "housing", "nobroker")
+MERGED_FIELDS = (
+    "name", "address", "priceInr", "perSqftPriceInr", "emiInr", "builtUpSqft", "facing", "apartmentType", "bathrooms",
+    "parking", "latitude", "longitude", "possessionStatus", "possessionDate", "agentName", "description",
+)
+
+STOP_WORDS = {"in", "at", "the", "for", "sale", "flat", "apartment", "apartments", "bhk", "of", "and", "by"}
+EARTH_RADIUS_METERS = 6_371_000
+
+def tokens(text):
+    return " ".join(sorted(word for word in re.findall(r"[a-z0-9]+", (text or "").lower()) if word not in STOP_WORDS))
+
+def normalise(listing):
+    # Scraped listings arrive normalised already; snapshots stored before that did not.
+    record = dict(listing)
+    if record.get("priceInr") is None:
+        record["priceInr"] = parse_price(listing.get("price"))
+    if record.get("builtUpSqft") is None:
+        record["builtUpSqft"] = parse_area(listing.get("builtUp"))
+    record["latitude"] = parse_coordinate(listing.get("latitude"))
+    record["longitude"] = parse_coordinate(listing.get("longitude"))
+    record["nameKey"] = tokens(listing.get("name"))
+    record["addressKey"] = tokens(listing.get("address"))
+    return record
+
+def distance_meters(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a["latitude"], a["longitude"], b["latitude"], b["longitude"]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(h))
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    # quick_ratio is an upper bound on ratio and much cheaper; skip the full diff when it
+    # already rules the pair out.
+    if matcher.real_quick_ratio() < MERGE_NAME_SIMILARITY or matcher.quick_ratio() < MERGE_NAME_SIMILARITY:
+        return 0.0
+    return matcher.ratio()
+
+def close(a, b, tolerance):
+    if a is None or b is None:
+        return True
+    return abs(a - b) <= tolerance * max(a, b)
+
+def same_property(a, b, check_distance=True):
+    if a["source"] == b["source"]:
+        return False
+    if check_distance and distance_meters(a, b) > MERGE_DISTANCE_METERS:
+        return False
+    if not close(a["priceInr"], b["priceInr"], MERGE_PRICE_TOLERANCE):
+        return False
+    if not close(a["builtUpSqft"], b["builtUpSqft"], MERGE_AREA_TOLERANCE):
+        return False
+    return max(similarity(a["nameKey"], b["nameKey"]), similarity(a["addressKey"], b["addressKey"])) >= MERGE_NAME_SIMILARITY
+
+def price_band(price):
+    # Prices within MERGE_PRICE_TOLERANCE of each other land in the same or adjacent band.
+    if price is None or price <= 0 or not 0 < MERGE_PRICE_TOLERANCE < 1:
+        return None
+    return math.floor(math.log(price) / -math.log(1 - MERGE_PRICE_TOLERANCE))
+
+class BandedIndex:
+    # Positions bucketed by an arbitrary key and then by price band. A priced listing is
+    # only a candidate for listings in its own or an adjacent band, or without a price;
+    # one without a price is a candidate for every band. Newest positions come first.
+    def __init__(self):
+        self._buckets = {}
+
+    def add(self, key, position, record):
+        self._buckets.setdefault(key, {}).setdefault(price_band(record["priceInr"]), []).append(position)
+
+    def candidates(self, key, record):
+        bands = self._buckets.get(key)
+        if not bands:
+            return
+        band = price_band(record["priceInr"])
+        for candidate_band in (bands if band is None else (band, band - 1, band + 1, None)):
+            yield from reversed(bands.get(candidate_band, ()))
+
+class GridIndex(BandedIndex):
+    # Buckets listings into cells about one merge radius wide, so a listing only has to be
+    # compared with what is in its own and the eight neighbouring cells.
+    def __init__(self, radius_meters=MERGE_DISTANCE_METERS):
+        super().__init__()
+        self.lat_step = radius_meters / 111_320
+
+    def _cell(self, record):
+        lon_step = self.lat_step / max(math.cos(math.radians(record["latitude"])), 0.01)
+        return math.floor(record["latitude"] / self.lat_step), math.floor(record["longitude"] / lon_step)
+
+    def add(self, position, record):
+        super().add(self._cell(record), position, record)
+
+    def nearby(self, record):
+        row, col = self._cell(record)
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                yield from self.candidates((row + d_row, col + d_col), record)
+
+class DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+        return min(root_a, root_b)
+
+def _span(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1])
+
+class Clusters(DisjointSet):
+    # Union-find over listings that also keeps, per root, the sources in the cluster and
+    # its price and area spans. Two clusters only join if that keeps one listing per
+    # source, keeps the whole cluster within the price and area tolerances, and their
+    # representatives (first listing of each) match, so matches can't chain.
+    def __init__(self, records):
+        super().__init__(len(records))
+        self.records = records
+        self.sources = [{record["source"]} for record in records]
+        self.prices = [None if record["priceInr"] is None else (record["priceInr"],) * 2 for record in records]
+        self.areas = [None if record["builtUpSqft"] is None else (record["builtUpSqft"],) * 2 for record in records]
+
+    def joinable(self, root_a, root_b):
+        if self.sources[root_a] & self.sources[root_b]:
+            return False
+        prices = _span(self.prices[root_a], self.prices[root_b])
+        if prices is not None and not close(prices[0], prices[1], MERGE_PRICE_TOLERANCE):
+            return False
+        areas = _span(self.areas[root_a], self.areas[root_b])
+        if areas is not None and not close(areas[0], areas[1], MERGE_AREA_TOLERANCE):
+            return False
+        rep_a, rep_b = self.records[root_a], self.records[root_b]
+        located = all(rep[axis] is not None for rep in (rep_a, rep_b) for axis in ("latitude", "longitude"))
+        return same_property(rep_a, rep_b, check_distance=located)
+
+    def try_union(self, a, b, check_distance=True):
+        # Joins a's and b's clusters if the pair and the clusters match; returns whether it did.
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b or self.sources[root_a] & self.sources[root_b]:
+            return False
+        if not same_property(self.records[a], self.records[b], check_distance) or not self.joinable(root_a, root_b):
+            return False
+        root = self.union(root_a, root_b)
+        other = root_b if root == root_a else root_a
+        self.sources[root] |= self.sources[other]
+        self.prices[root] = _span(self.prices[root], self.prices[other])
+        self.areas[root] = _span(self.areas[root], self.areas[other])
+        return True
+
+def _source_rank(record):
+    source = record.get("source")
+    return SOURCE_PRIORITY.index(source) if source in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+
+def merge_cluster(records):
+    records = sorted(records, key=_source_rank)
+    merged, provenance = {}, {}
+    for field in MERGED_FIELDS:
+        for record in records:
+            if record.get(field) is not None:
+                merged[field] = record[field]
+                provenance[field] = record["source"]
+                break
+        else:
+            merged[field] = None
+    prices = [record["priceInr"] for record in records if record["priceInr"] is not None]
+    images = []
+    for record in records:
+        for image in record.get("image") or []:
+            if image not in images:
+                images.append(image)
+    merged.update({
+        "city": records[0].get("city"),
+        "locality": records[0].get("locality"),
+        "image": images or None,
+        "priceRangeInr": [min(prices), max(prices)] if prices else None,
+        "sources": list(dict.fromkeys(record["source"] for record in records)),
+        "provenance": provenance,
+        "listings": [
+            {"source": record["source"], "link": record.get("link"), "name": record.get("name"),
+             "price": record.get("price"), "priceInr": record["priceInr"], "builtUpSqft": record["builtUpSqft"]}
+            for record in records
+        ],
+    })
+    return merged
+
+def merge(listings):
+    """Collapse listings of the same property across sources into one record each.
+
+    Listings with coordinates are matched against their grid neighbours. Listings
+    without them are matched on the exact normalised name within the same locality,
+    against listings from any source. Candidates are also bucketed by price band, and a
+    cluster never holds two listings from one source, so each listing is compared with
+    a bounded number of candidates and this stays near-linear.
+    """
+    records = [normalise(listing) for listing in listings if listing.get("source")]
+    clusters = Clusters(records)
+    grid = GridIndex()
+    # Located listings only need the unlocated ones with their name; the rest they meet
+    # through the grid.
+    by_name, unlocated_by_name = BandedIndex(), BandedIndex()
+    for position, record in enumerate(records):
+        located = record["latitude"] is not None and record["longitude"] is not None
+        key = (str(record.get("locality") or "").strip().lower(), record["nameKey"]) if record["nameKey"] else None
+        candidates = []
+        if located:
+            candidates.append((grid.nearby(record), True))
+        if key:
+            candidates.append(((unlocated_by_name if located else by_name).candidates(key, record), False))
+        for others, check_distance in candidates:
+            for other in itertools.islice(others, MERGE_MAX_CANDIDATES):
+                clusters.try_union(position, other, check_distance)
+        if located:
+            grid.add(position, record)
+        if key:
+            by_name.add(key, position, record)
+            if not located:
+                unlocated_by_name.add(key, position, record)
+    grouped = {}
+    for position, record in enumerate(records):
+        grouped.setdefault(clusters.find(position), []).append(record)
+    return [merge_cluster(group) for group in grouped.values()]
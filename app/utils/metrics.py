@@ -0,0 +1,25 @@
+# app/utils/metrics.py
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+PHASE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+PHASE_SECONDS = Histogram("scraper_phase_seconds", "Time spent per scrape phase", ["source", "phase"], buckets=PHASE_BUCKETS)
+REQUEST_SECONDS = Histogram("scraper_request_seconds", "API request latency", ["route", "status"], buckets=PHASE_BUCKETS)
+BROWSERS_LAUNCHED = Counter("scraper_browsers_launched_total", "Chrome sessions started by the driver pool")
+DETAIL_FETCHES = Counter("scraper_detail_fetches_total", "Detail pages fetched over the network", ["source"])
+CACHE_LOOKUPS = Counter("scraper_cache_lookups_total", "Cache lookups by outcome", ["result"])
+FAILURES = Counter("scraper_failures_total", "Failures by source and exception type", ["source", "type"])
+LISTING_CHANGES = Counter("scraper_listing_changes_total", "Re-crawled listings by outcome", ["source", "change"])
+LISTINGS = Counter("scraper_listings_total", "Listings produced; rate() gives listings per second", ["source"])
+
+def failure(source, error):
+    FAILURES.labels(source, type(error).__name__).inc()
+
+def count_listings(source, listings):
+    counter = LISTINGS.labels(source)
+    for listing in listings:
+        counter.inc()
+        yield listing
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,110 @@
+# app/utils/normalise.py
+import math
+import re
+
+PRICE_UNITS = {"cr": 10_000_000, "crore": 10_000_000, "crores": 10_000_000,
+               "l": 100_000, "lac": 100_000, "lacs": 100_000, "lakh": 100_000, "lakhs": 100_000,
+               "k": 1_000, "thousand": 1_000}
+# Square feet per unit, keyed by the unit's "kind" (ft, m or yd) after normalising spelling.
+AREA_FACTORS = {"ft": 1.0, "m": 10.7639, "yd": 9.0}
+AREA_KINDS = {"ft": "ft", "feet": "ft", "foot": "ft", "m": "m", "mt": "m", "mtr": "m", "mtrs": "m", "meter": "m",
+              "meters": "m", "metre": "m", "metres": "m", "yd": "yd", "yds": "yd", "yard": "yd", "yards": "yd"}
+
+AMOUNT = r"\d[\d,]*(?:\.\d+)?"
+RUPEE = r"(?:₹|rs\.?|inr)"
+PRICE_UNIT = r"(?:crores?|cr|lakhs?|lacs?|lac|l|thousand|k)\b\.?"
+# "₹ 1.5 - 2 Cr": the low end's unit may only be given at the end of the range.
+PRICE = re.compile(
+    rf"(?P<rupee>{RUPEE})?\s*(?P<low>{AMOUNT})\s*(?P<low_unit>{PRICE_UNIT})?"
+    rf"(?:\s*(?:-|–|to)\s*{RUPEE}?\s*(?P<high>{AMOUNT})\s*(?P<high_unit>{PRICE_UNIT})?)?"
+)
+AREA_UNIT = r"(?:sq(?:uare)?\.?\s*(?:ft|feet|foot|mtrs?|mtr|mt|metres?|meters?|m|yds?|yards?|yd)|ft2|m2)\b\.?"
+AREA = re.compile(
+    rf"(?P<low>{AMOUNT})\s*(?P<low_unit>{AREA_UNIT})?"
+    rf"(?:\s*(?:-|–|to)\s*(?P<high>{AMOUNT})\s*(?P<high_unit>{AREA_UNIT})?)?"
+)
+BARE_AMOUNT = re.compile(rf"\s*{RUPEE}?\s*({AMOUNT})\s*")
+
+def _amount(text):
+    return float(text.replace(",", ""))
+
+def _price_unit(unit):
+    return PRICE_UNITS[unit.rstrip(".")]
+
+def _area_factor(unit):
+    if unit in ("ft2", "m2"):
+        return AREA_FACTORS[unit[:-1]]
+    kind = re.sub(r"^sq(?:uare)?\.?\s*", "", unit.rstrip("."))
+    return AREA_FACTORS[AREA_KINDS[kind]]
+
+def parse_price(value):
+    # "₹2.05 Cr", "78.5 Lac", "₹ 1,20,00,000", "₹20.5K" -> whole rupees. Only a number
+    # marked as money (₹ before it or a unit after it) counts, so "2 BHK ₹ 1.2 Cr" is
+    # 1.2 Cr; a range gives its low end, in the range's unit ("₹ 1.5 - 2 Cr" -> 1.5 Cr).
+    # Anything else is None.
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).lower()
+    bare = BARE_AMOUNT.fullmatch(text)
+    if bare:
+        return int(round(_amount(bare.group(1))))
+    for match in PRICE.finditer(text):
+        unit = match.group("low_unit") or match.group("high_unit")
+        if match.group("rupee") or unit:
+            return int(round(_amount(match.group("low")) * (_price_unit(unit) if unit else 1)))
+    return None
+
+def parse_area(value):
+    # "1,234 sq.ft", "120 sq.m", "200 sq.yd" -> square feet. A bare number is taken as
+    # square feet; otherwise the number must carry a known unit ("3 BHK 1200 sqft" is
+    # 1200), a range gives its low end, and an unknown unit ("2 acres") is None.
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).lower()
+    bare = BARE_AMOUNT.fullmatch(text)
+    if bare and not re.match(rf"\s*{RUPEE}", text):
+        return round(_amount(bare.group(1)), 1)
+    for match in AREA.finditer(text):
+        unit = match.group("low_unit") or match.group("high_unit")
+        if unit:
+            return round(_amount(match.group("low")) * _area_factor(unit), 1)
+    return None
+
+def parse_coordinate(value):
+    try:
+        coordinate = float(value)
+    except (TypeError, ValueError):
+        return None
+    return coordinate if math.isfinite(coordinate) and coordinate != 0.0 else None
+
+class _Memo(dict):
+    # Listing pages repeat the same few price and area strings, so each distinct string
+    # is parsed once per batch.
+    def __init__(self, parse):
+        super().__init__()
+        self.parse = parse
+
+    def __missing__(self, value):
+        parsed = self[value] = self.parse(value)
+        return parsed
+
+def normalise_page(props):
+    """Fill in the numeric fields of a page of Property objects in one pass."""
+    prices, areas = _Memo(parse_price), _Memo(parse_area)
+    for prop in props:
+        prop.priceInr = prices[prop.price]
+        prop.perSqftPriceInr = prices[prop.perSqftPrice]
+        prop.emiInr = prices[prop.emi]
+        prop.builtUpSqft = areas[prop.builtUp]
+        prop.latitude = parse_coordinate(prop.latitude)
+        prop.longitude = parse_coordinate(prop.longitude)
+    return props
+
+def set_coordinates(prop, latitude, longitude):
+    prop.latitude = parse_coordinate(latitude)
+    prop.longitude = parse_coordinate(longitude)
+    return prop
@@ -0,0 +1,28 @@
+# app/utils/paging.py
+PAGE_SIZE = 10
+
+def page_bounds(page, page_size=PAGE_SIZE):
+    return (page - 1) * page_size, page * page_size
+
+def window(fetch_site_page, page, page_size=PAGE_SIZE):
+    # Site page 1 tells us how many cards the site serves per page, which lets us jump
+    # straight to the site page holding the start of the requested API page.
+    start, end = page_bounds(page, page_size)
+    cards = fetch_site_page(1)
+    if not cards:
+        return
+    per_site_page = len(cards)
+    site_page = start // per_site_page + 1
+    skip = start - (site_page - 1) * per_site_page
+    if site_page > 1:
+        cards = fetch_site_page(site_page)
+    remaining = end - start
+    while cards:
+        for card in cards[skip:skip + remaining]:
+            yield card
+            remaining -= 1
+        if remaining <= 0:
+            return
+        skip = max(0, skip - len(cards))
+        site_page += 1
+        cards = fetch_site_page(site_page)
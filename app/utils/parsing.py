@@ -0,0 +1,71 @@
+# app/utils/parsing.py
+from lxml import etree, html
+
+def cls(*names):
+    # XPath predicate matching elements that carry every one of the given CSS classes.
+    return "".join(f"[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]" for name in names)
+
+def text_of(node, strip=False):
+    if isinstance(node, str):
+        return node.strip() if strip else str(node)
+    if strip:
+        # Same as BeautifulSoup's get_text(strip=True): strip each text node, then join.
+        return "".join(part.strip() for part in node.itertext())
+    return "".join(node.itertext())
+
+class Field:
+    # xpath may be a tuple of alternatives; the first one that matches anything wins,
+    # which lets a cheap local expression front an expensive exact one.
+    def __init__(self, xpath, attr=None, strip=False, index=0, transform=None):
+        self.xpaths = [etree.XPath(expr) for expr in ((xpath,) if isinstance(xpath, str) else xpath)]
+        self.attr = attr
+        self.strip = strip
+        self.index = index
+        self.transform = transform
+
+    def extract(self, node):
+        for xpath in self.xpaths:
+            matches = xpath(node)
+            if matches:
+                break
+        if len(matches) <= self.index:
+            value = None
+        else:
+            match = matches[self.index]
+            if self.attr is not None:
+                value = match.get(self.attr)
+            else:
+                value = text_of(match, self.strip)
+        return self.transform(value) if self.transform and value is not None else value
+
+class Schema:
+    def __init__(self, card_xpath, fields):
+        self.card_xpath = etree.XPath(card_xpath)
+        self.fields = fields
+
+    def parse_card(self, card):
+        return {name: field.extract(card) for name, field in self.fields.items()}
+
+    def parse(self, page_source):
+        document = parse_document(page_source)
+        if document is None:
+            return []
+        return [self.parse_card(card) for card in self.card_xpath(document)]
+
+    def parse_fragments(self, fragments):
+        # For cards pulled out of a live page one by one; each fragment is the card element.
+        return [self.parse_card(html.fragment_fromstring(fragment)) for fragment in fragments]
+
+def extract(fields, page_source):
+    document = parse_document(page_source)
+    if document is None:
+        return None
+    return {name: field.extract(document) for name, field in fields.items()}
+
+def parse_document(page_source):
+    if not page_source or not page_source.strip():
+        return None
+    try:
+        return html.document_fromstring(page_source)
+    except (etree.ParserError, ValueError):
+        return None
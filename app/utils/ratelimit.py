@@ -0,0 +1,74 @@
+# app/utils/ratelimit.py
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# Requests per second allowed to any one host, shared by HTTP fetches and browser page
+# loads across the whole process. 0 disables limiting.
+DOMAIN_RATE_LIMIT = float(os.getenv("DOMAIN_RATE_LIMIT", "4"))
+DOMAIN_RATE_BURST = float(os.getenv("DOMAIN_RATE_BURST", "8"))
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _reserve(self):
+        # Takes a token, going into debt if there is none, and returns how long the
+        # caller has to wait for its token to exist. Debt keeps waiters in arrival order.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += delay
+            return delay
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+class DomainLimiter:
+    def __init__(self, rate=DOMAIN_RATE_LIMIT, burst=DOMAIN_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        if not host or self.rate <= 0:
+            return 0.0
+        return self.bucket(host).acquire()
+
+    def stats(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {
+            "ratePerSecond": self.rate,
+            "burst": self.burst,
+            "waitedSeconds": {host: round(bucket.waited, 3) for host, bucket in buckets.items()},
+        }
+
+limiter = DomainLimiter()
+
+def acquire(url):
+    return limiter.acquire(url)
+
+def stats():
+    return limiter.stats()
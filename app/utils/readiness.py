@@ -0,0 +1,156 @@
+# app/utils/readiness.py
+import logging
+import os
+import threading
+import time
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("READINESS_POLL_INTERVAL", "0.2"))
+QUIET_WINDOW = float(os.getenv("READINESS_QUIET_WINDOW", "0.6"))
+MIN_TIMEOUT = float(os.getenv("READINESS_MIN_TIMEOUT", "2"))
+MAX_TIMEOUT = float(os.getenv("READINESS_MAX_TIMEOUT", "15"))
+DEFAULT_TIMEOUTS = {"housing": 10.0, "squareyard": 10.0, "nobroker": 8.0}
+
+# Counts DOM mutations and in-flight fetch/XHR requests so a wait can tell "still loading"
+# apart from "nothing more is coming". Installing it twice is a no-op.
+INSTRUMENT_JS = """
+if (!window.__readiness) {
+    const state = window.__readiness = {inflight: 0, lastActivity: performance.now()};
+    const touch = () => { state.lastActivity = performance.now(); };
+    new MutationObserver(touch).observe(document, {childList: true, subtree: true, attributes: true});
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function() {
+            state.inflight++; touch();
+            return originalFetch.apply(this, arguments).finally(() => { state.inflight--; touch(); });
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        state.inflight++; touch();
+        this.addEventListener('loadend', () => { state.inflight--; touch(); });
+        return originalSend.apply(this, arguments);
+    };
+}
+"""
+
+STATE_JS = """
+const state = window.__readiness || {inflight: 0, lastActivity: 0};
+const resources = performance.getEntriesByType('resource');
+const lastResource = resources.length ? resources[resources.length - 1].responseEnd : 0;
+return {
+    cards: document.querySelectorAll(arguments[0]).length,
+    complete: document.readyState === 'complete',
+    inflight: state.inflight,
+    idleFor: (performance.now() - Math.max(state.lastActivity, lastResource)) / 1000
+};
+"""
+
+# Scrolling restarts the quiet window so a lazy loader gets a chance to fire before we
+# decide nothing new is coming.
+SCROLL_JS = """
+window.scrollTo(0, document.body.scrollHeight);
+if (window.__readiness) { window.__readiness.lastActivity = performance.now(); }
+"""
+
+class AdaptiveTimeouts:
+    def __init__(self, defaults=DEFAULT_TIMEOUTS, minimum=MIN_TIMEOUT, maximum=MAX_TIMEOUT):
+        self.minimum = minimum
+        self.maximum = maximum
+        self._typical = {source: timeout / 3 for source, timeout in defaults.items()}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def timeout(self, source):
+        with self._lock:
+            typical = self._typical.get(source, self.maximum / 3)
+        return min(self.maximum, max(self.minimum, typical * 3))
+
+    def record(self, source, elapsed, timed_out):
+        with self._lock:
+            typical = self._typical.get(source, self.maximum / 3)
+            # Timeouts tell us the budget was too tight, not how long the page really needs.
+            self._typical[source] = typical * 1.5 if timed_out else 0.8 * typical + 0.2 * elapsed
+            stats = self._stats.setdefault(source, {"waits": 0, "timeouts": 0, "totalWait": 0.0})
+            stats["waits"] += 1
+            stats["timeouts"] += int(timed_out)
+            stats["totalWait"] += elapsed
+
+    def stats(self):
+        with self._lock:
+            sources = {source: dict(stats) for source, stats in self._stats.items()}
+        for source, stats in sources.items():
+            stats["averageWait"] = round(stats["totalWait"] / stats["waits"], 3)
+            stats["totalWait"] = round(stats["totalWait"], 3)
+            stats["timeout"] = round(self.timeout(source), 3)
+        return sources
+
+timeouts = AdaptiveTimeouts()
+
+def page_state(driver, selector):
+    driver.execute_script(INSTRUMENT_JS)
+    return driver.execute_script(STATE_JS, selector)
+
+def _wait(driver, source, selector, ready):
+    timeout = timeouts.timeout(source)
+    started = time.monotonic()
+    last = {}
+
+    def check(_):
+        try:
+            last.update(page_state(driver, selector))
+        except WebDriverException:
+            return False
+        return ready(last)
+
+    timed_out = False
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(check)
+    except TimeoutException:
+        timed_out = True
+    elapsed = time.monotonic() - started
+    timeouts.record(source, elapsed, timed_out)
+    return last.get("cards", 0), elapsed
+
+def _quiet(state):
+    return state["complete"] and state["inflight"] == 0 and state["idleFor"] >= QUIET_WINDOW
+
+def wait_for_cards(driver, source, selector, min_count=1):
+    # Ready once enough cards are on the page and it has gone quiet; a page that stays
+    # quiet for twice the window without cards is treated as an empty results page.
+    def ready(state):
+        if state["cards"] >= min_count:
+            return _quiet(state)
+        return _quiet(state) and state["idleFor"] >= 2 * QUIET_WINDOW
+    return _wait(driver, source, selector, ready)
+
+def wait_for_growth(driver, source, selector, previous_count):
+    # Returns as soon as new cards appear, or once the page settles without any.
+    def ready(state):
+        return state["cards"] > previous_count or _quiet(state)
+    return _wait(driver, source, selector, ready)
+
+def scroll_to_bottom(driver):
+    driver.execute_script(SCROLL_JS)
+
+def scroll_until_stable(driver, source, selector, max_scrolls=10, target=None):
+    count, waited = wait_for_cards(driver, source, selector)
+    for _ in range(max_scrolls):
+        if target is not None and count >= target:
+            break
+        scroll_to_bottom(driver)
+        new_count, elapsed = wait_for_growth(driver, source, selector, count)
+        waited += elapsed
+        if new_count <= count:
+            break
+        count = new_count
+    return count, waited
+
+def log_page(source, url, cards, waited):
+    logger.info("%s page ready: %d cards after %.2fs waiting (%s)", source, cards, waited, url)
+
+def stats():
+    return timeouts.stats()
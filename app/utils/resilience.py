@@ -0,0 +1,223 @@
+# app/utils/resilience.py
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+from app.utils import cache, metrics
+
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "12"))
+SOURCE_TIMEOUT = float(os.getenv("SOURCE_TIMEOUT", "120"))
+SOURCE_RETRIES = int(os.getenv("SOURCE_RETRIES", "1"))
+RETRY_BACKOFF = float(os.getenv("SOURCE_RETRY_BACKOFF", "1.0"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET_SECONDS", "60"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+# Never hedge sooner than this: a duplicate scrape costs a second browser checkout.
+HEDGE_MIN_SECONDS = float(os.getenv("HEDGE_MIN_SECONDS", "2"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+
+class CircuitBreaker:
+    # closed: calls go through. open: BREAKER_FAILURES failures in a row, so calls fail
+    # fast for BREAKER_RESET seconds. half_open: one trial call is let through; its
+    # outcome closes or re-opens the circuit.
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            stats = {"state": self.state, "failures": self.failures}
+            if self.state == "open":
+                stats["retryIn"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return stats
+
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, name, q=HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES):
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self):
+        with self._lock:
+            names = list(self._samples)
+        return {name: {"p50": self.quantile(name, 0.5, 1), "p95": self.quantile(name, 0.95, 1)} for name in names}
+
+class SourceUnavailable(RuntimeError):
+    pass
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+latency = LatencyTracker()
+# Shared by every fan-out request instead of a pool per request. An attempt that
+# overruns its deadline keeps its worker until the underlying HTTP or page-load
+# timeout fires, so the pool is sized for a few of those.
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+# call() blocks while it supervises its attempts, so fan_out runs the supervisors on
+# their own pool; sharing _executor could leave every worker waiting on attempts that
+# have nowhere to run.
+_supervisors = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout-call")
+
+def breaker(url):
+    host = urlparse(url).netloc or url
+    with _breakers_lock:
+        circuit = _breakers.get(host)
+        if circuit is None:
+            circuit = _breakers[host] = CircuitBreaker()
+        return circuit
+
+def source_timeout(name):
+    # SOURCE_TIMEOUT_<NAME>=30 gives one slow source a deadline of its own.
+    value = os.getenv(f"SOURCE_TIMEOUT_{name.upper()}")
+    return float(value) if value else SOURCE_TIMEOUT
+
+def call(name, url, fn, timeout=SOURCE_TIMEOUT, retries=SOURCE_RETRIES, hedge=True):
+    """Run fn for one source with a deadline, retries, hedging and the site's breaker.
+
+    Returns (result, status). status["status"] is "ok", "error", "timeout" or
+    "circuit_open"; result is None unless it is "ok". A failed attempt is retried after
+    an exponential backoff while the deadline allows. Once the source's p95 latency is
+    known (from attempts that fetched rather than hit the cache), an attempt still
+    running past it, and past HEDGE_MIN_SECONDS, gets a second, hedged attempt
+    alongside it, and whichever finishes first wins.
+    """
+    circuit = breaker(url)
+    started = time.monotonic()
+    if not circuit.allow():
+        metrics.failure(name, SourceUnavailable())
+        return None, {"status": "circuit_open", "attempts": 0, "hedged": False, "seconds": 0.0,
+                      "error": f"{urlparse(url).netloc} is failing, not retrying until its circuit resets"}
+    deadline = started + timeout
+    hedge_after = latency.quantile(name) if hedge else None
+    if hedge_after is not None:
+        hedge_after = max(hedge_after, HEDGE_MIN_SECONDS)
+    running = {}
+    attempts, failures, hedged, error = 0, 0, False, None
+    retry_at = None
+
+    def attempt():
+        with cache.counting() as lookups:
+            return fn(), lookups["computed"] > 0
+
+    def launch():
+        nonlocal attempts
+        attempts += 1
+        running[_executor.submit(contextvars.copy_context().run, attempt)] = time.monotonic()
+
+    launch()
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        if retry_at is not None and now >= retry_at:
+            retry_at = None
+            launch()
+        if not running and retry_at is None:
+            break
+        wake = [deadline]
+        if retry_at is not None:
+            wake.append(retry_at)
+        if hedge_after is not None and not hedged and running:
+            wake.append(min(running.values()) + hedge_after)
+        if running:
+            done, _ = wait(list(running), timeout=max(0.0, min(wake) - now), return_when=FIRST_COMPLETED)
+        else:
+            # Backing off before a retry.
+            time.sleep(max(0.0, min(wake) - now))
+            done = ()
+        for future in done:
+            attempt_started = running.pop(future)
+            if future.exception() is None:
+                result, fetched = future.result()
+                # Cache hits take milliseconds; counting them would drag the p95 down until
+                # every real fetch got hedged.
+                if fetched:
+                    latency.record(name, time.monotonic() - attempt_started)
+                circuit.record(True)
+                for other in running:
+                    other.cancel()
+                return result, {"status": "ok", "attempts": attempts, "hedged": hedged,
+                                         "seconds": round(time.monotonic() - started, 3), "error": None}
+            failures += 1
+            error = future.exception()
+            metrics.failure(name, error)
+        if not running and retry_at is None:
+            if failures > retries:
+                break
+            backoff = RETRY_BACKOFF * 2 ** (failures - 1) * random.uniform(0.5, 1.5)
+            retry_at = time.monotonic() + backoff
+            if retry_at >= deadline:
+                break
+        elif hedge_after is not None and not hedged and running and time.monotonic() >= min(running.values()) + hedge_after:
+            hedged = True
+            launch()
+    for future in running:
+        future.cancel()
+    circuit.record(False)
+    timed_out = bool(running) or time.monotonic() >= deadline
+    return None, {"status": "timeout" if timed_out else "error", "attempts": attempts, "hedged": hedged,
+                  "seconds": round(time.monotonic() - started, 3),
+                  "error": f"no result within {timeout:g}s" if timed_out and error is None else str(error)}
+
+def fan_out(calls, timeout=None):
+    """Run call() for every {name: (url, fn)} concurrently; returns {name: (result, status)}.
+
+    timeout applies to every source when given, otherwise each gets source_timeout(name).
+    """
+    futures = {
+        name: _supervisors.submit(contextvars.copy_context().run, call, name, url, fn,
+                                  source_timeout(name) if timeout is None else timeout)
+        for name, (url, fn) in calls.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+def stats():
+    with _breakers_lock:
+        circuits = dict(_breakers)
+    return {
+        "circuits": {host: circuit.stats() for host, circuit in circuits.items()},
+        "latency": latency.stats(),
+    }
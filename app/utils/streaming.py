@@ -0,0 +1,74 @@
+# app/utils/streaming.py
+import json
+import os
+import queue
+import threading
+from app.utils import metrics
+
+STREAM_BUFFER = int(os.getenv("STREAM_BUFFER", "20"))
+
+_DONE = object()
+
+def merge(iterators, buffer=STREAM_BUFFER):
+    # Each source runs in its own producer thread and feeds a bounded queue, so a slow
+    # client blocks the producers instead of letting parsed listings pile up in memory.
+    items = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+
+    def offer(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(name, iterator):
+        try:
+            for item in iterator:
+                if not offer((name, item, None)):
+                    return
+        except Exception as e:
+            metrics.failure(name, e)
+            offer((name, None, e))
+        finally:
+            offer((name, _DONE, None))
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    for name, iterator in iterators.items():
+        threading.Thread(target=produce, args=(name, iterator), name=f"stream-{name}", daemon=True).start()
+    remaining = len(iterators)
+    try:
+        while remaining:
+            name, item, error = items.get()
+            if item is _DONE:
+                remaining -= 1
+            else:
+                yield name, item, error
+    finally:
+        # Lets producers blocked on a full queue give up once the client has gone away.
+        stop.set()
+
+def ndjson_line(payload):
+    return json.dumps(payload) + "\n"
+
+def sse_event(payload, event=None):
+    data = f"data: {json.dumps(payload)}\n\n"
+    return f"event: {event}\n{data}" if event else data
+
+def encode(records, fmt):
+    # records yields (source, property, error) triples; errors are sent in-band so one
+    # failing source doesn't truncate the stream of the others.
+    for source, prop, error in records:
+        if error is not None:
+            payload = {"source": source, "error": str(error)}
+            yield sse_event(payload, "error") if fmt == "sse" else ndjson_line(payload)
+        else:
+            yield sse_event(prop) if fmt == "sse" else ndjson_line(prop)
+    if fmt == "sse":
+        yield sse_event({}, "end")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
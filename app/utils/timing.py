@@ -0,0 +1,59 @@
+# app/utils/timing.py
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from app.utils import metrics
+
+_totals = {}
+_lock = threading.Lock()
+# Per-request breakdown for the X-Timing header. Pool submissions copy the context, so
+# spans recorded on worker threads land in the same request's collector.
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+def record(phase, seconds, source=None):
+    key = (source, phase)
+    metrics.PHASE_SECONDS.labels(source or "-", phase).observe(seconds)
+    with _lock:
+        entry = _totals.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        spans = _request_spans.get()
+        if spans is not None:
+            entry = spans.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+@contextmanager
+def span(phase, source=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started, source)
+
+def start_request():
+    spans = {}
+    _request_spans.set(spans)
+    return spans
+
+def header(spans, total):
+    with _lock:
+        items = sorted(spans.items(), key=lambda item: (item[0][0] or "", item[0][1]))
+    parts = [f"total;dur={total * 1000:.1f}"]
+    for (source, phase), (count, seconds) in items:
+        name = f"{source}.{phase}" if source else phase
+        parts.append(f"{name};dur={seconds * 1000:.1f};count={count}")
+    return ", ".join(parts)
+
+def snapshot():
+    with _lock:
+        items = [(key, list(entry)) for key, entry in _totals.items()]
+    phases = {}
+    for (source, phase), (count, seconds) in items:
+        phases.setdefault(source or "-", {})[phase] = {"count": count, "seconds": round(seconds, 4)}
+    return phases
+
+def reset():
+    with _lock:
+        _totals.clear()
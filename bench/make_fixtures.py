@@ -0,0 +1,145 @@
+"""Regenerate the HTML fixtures in bench/fixtures.
+
+The fixtures mirror the markup the scrapers select on (same tags, classes and data
+attributes) and carry a realistic amount of surrounding page chrome, so parse timings
+are comparable to live pages without storing copies of third-party sites. __BASE__,
+__LAT__ and __LON__ placeholders are filled in by bench/server.py when served.
+
+    python bench/make_fixtures.py
+"""
+import json
+import os
+import random
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CARDS_PER_PAGE = 30
+SITE_PAGES = 3
+
+NAMES = ["Ashiana Towers", "Green Park Residency", "DLF Capital Greens", "Lodha Palava", "Hiranandani Gardens",
+         "Prestige Lakeside", "Godrej Woods", "Sobha City", "Tata Primanti", "Mahagun Moderne"]
+FLATS = ["1 BHK Flat", "2 BHK Apartment", "3 BHK Apartment", "4 BHK Builder Floor", "Studio Apartment"]
+PRICES = ["45 Lac", "78.5 Lac", "1.2 Cr", "2.05 Cr", "95 L", "3.4 Cr"]
+
+def chrome(title, body):
+    nav = "".join(f'<li><a href="/nav/{i}" class="navLink">Link {i}</a></li>' for i in range(150))
+    styles = "".join(f".c{i}{{margin:{i}px;padding:{i % 7}px}}" for i in range(400))
+    scripts = "".join(f'<script>window.__track{i}=function(){{return {i};}};</script>' for i in range(40))
+    footer = "".join(f'<div class="footerCol"><p>Footer text block {i} with some copy.</p></div>' for i in range(60))
+    return (f"<!DOCTYPE html><html><head><title>{title}</title><style>{styles}</style>{scripts}</head>"
+            f"<body><header><ul class=\"nav\">{nav}</ul></header><main>{body}</main><footer>{footer}</footer></body></html>")
+
+def listing(rng, source, n):
+    return {
+        "name": f"{rng.choice(FLATS)} in {rng.choice(NAMES)}",
+        "price": rng.choice(PRICES),
+        "area": f"{rng.randint(450, 3200):,} sq.ft",
+        "lat": round(28.40 + rng.random() / 10, 6),
+        "lon": round(77.00 + rng.random() / 10, 6),
+        "id": f"{source}{n:05d}",
+    }
+
+def housing_page(rng, site_page, base):
+    cards = []
+    for n in range(CARDS_PER_PAGE):
+        item = listing(rng, "h", site_page * 100 + n)
+        cards.append(
+            f'<article data-testid="card-container" class="T_cardV1Style _e21osq"><div class="T_imageStyle">'
+            f'<img src="data:image/gif;base64,R0lGODlhAQABAAAAACw=" data-src="https://is1-3.housingcdn.com/{item["id"]}.jpg"></div>'
+            f'<div class="T_content"><a data-q="title" href="{base}/in/buy/resale/page/{item["id"]}">'
+            f'<h2 class="T_4d93cd45 _c8dlk8">{item["name"]}</h2></a>'
+            f'<div data-testid="priceid" class="T_priceStyle">₹{item["price"]}</div>'
+            f'<span class="_9jtlke">EMI starts at ₹{rng.randint(20, 150)}.{rng.randint(1, 9)}K</span>'
+            f'<div class="T_config"><span>{item["area"]}</span><span>Ready to move</span></div></div></article>'
+        )
+    return chrome("Housing", "".join(cards))
+
+def nobroker_card(rng, n, base):
+    item = listing(rng, "n", n)
+    return (
+        f'<div class="nb__2_XSE" id="{item["id"]}"><meta itemprop="image" content="{item["id"]}/main.jpg">'
+        f'<a href="{base}/property/sale/{item["id"]}"><h2 class="heading-6 flex items-center">{item["name"]}</h2></a>'
+        f'<div class="text-gray-light mt-0.5p">{rng.choice(NAMES)}, Sector {rng.randint(1, 90)}</div>'
+        f'<div class="font-semi-bold heading-6">₹{item["price"]}</div>'
+        f'<div class="heading-7">₹{rng.randint(4000, 25000):,}/sq.ft</div>'
+        f'<div class="heading-6" id="roomType">₹{rng.randint(15, 160)},000/Month</div>'
+        f'<div class="flex" id="unitCode">{item["area"]}</div>'
+        f'<div class="nb__1q9Ta"><div>{rng.choice(["North", "East", "South", "West"])}</div><div class="font-semibold">Facing</div></div>'
+        f'<div class="nb__1q9Ta"><div>{rng.randint(1, 4)} BHK</div><div class="font-semibold">Apartment Type</div></div>'
+        f'<div class="nb__1q9Ta"><div>{rng.randint(1, 4)}</div><div class="font-semibold">Bathrooms</div></div>'
+        f'<div class="nb__1q9Ta"><div>{rng.choice(["Bike", "Car", "Bike and Car"])}</div><div class="font-semibold">Parking</div></div>'
+        f'</div>'
+    )
+
+def squareyard_card(rng, n, tile, base):
+    item = listing(rng, "s", n)
+    info = (f'<ul><li class="npListingInfo"><span>Ready to Move</span><span>{item["area"]}</span></li></ul>'
+            f'<div class="npListingPrice"><strong>₹ {item["price"]}</strong></div>'
+            f'<div class="npDescBox"><p>Well ventilated {item["name"]} close to metro.</p></div>'
+            f'<div class="npUserName"><strong>Agent {n}</strong></div>'
+            f'<img class="img-responsive" data-src="https://img.squareyards.com/{item["id"]}.jpg">')
+    if tile:
+        return (f'<div class="npListingTile"><h2 class="npListingLink">{item["name"]}</h2>'
+                f'<div class="npListingUnit"><span>{rng.choice(NAMES)}</span></div>'
+                f'<ul class="npTagBox" onclick="window.open(\'{base}/project/{item["id"]}\')"><li>tag</li></ul>{info}</div>')
+    return (f'<div class="clubListingsItem"><a class="strong" href="{base}/resale/{item["id"]}">{item["name"]}</a>'
+            f'<div class="npDeveloperLocation">{rng.choice(NAMES)}</div><h2 class="npListingLink">Apartment</h2>{info}</div>')
+
+def squareyard_page(rng, site_page, base):
+    half = CARDS_PER_PAGE // 2
+    cards = [squareyard_card(rng, site_page * 100 + n, False, base) for n in range(half)]
+    cards += [squareyard_card(rng, site_page * 100 + half + n, True, base) for n in range(half)]
+    return chrome("Square Yards", "".join(cards))
+
+# Appends the next batch of cards when the page is scrolled to the bottom, like the live
+# infinite scroll does.
+NOBROKER_SCROLL_JS = """<script>
+let nextBatch = 2, loading = false;
+window.addEventListener('scroll', () => {
+    if (loading || window.innerHeight + window.scrollY < document.body.scrollHeight - 50) return;
+    loading = true;
+    fetch('/__bench/nobroker/batch/' + nextBatch)
+        .then(response => response.status === 200 ? response.text() : '')
+        .then(cards => {
+            if (cards) { document.getElementById('listings').insertAdjacentHTML('beforeend', cards); nextBatch++; }
+            loading = false;
+        });
+});
+</script>"""
+
+def housing_detail():
+    ld = json.dumps([{"@type": "Residence", "geo": {"latitude": "__LAT__", "longitude": "__LON__"}}])
+    gallery = "".join(f'<img src="//is1-3.housingcdn.com/detail_{i}.jpg">' for i in range(4))
+    return chrome("Housing detail", f'<script type="application/ld+json">{ld}</script><div data-q="gallery">{gallery}</div>')
+
+def nobroker_detail():
+    return chrome("NoBroker detail", '<span itemprop="geo"><meta itemprop="latitude" content="__LAT__">'
+                                     '<meta itemprop="longitude" content="__LON__"></span>')
+
+def squareyard_detail():
+    return chrome("Square Yards detail", '<ul class="nearLocation scrollBarHide"><li class="locatedLi" '
+                                         'data-latitude="__LAT__" data-longitude="__LON__">Here</li></ul>')
+
+def write(name, content):
+    with open(os.path.join(FIXTURES, name), "w") as f:
+        f.write(content)
+
+def main():
+    os.makedirs(FIXTURES, exist_ok=True)
+    rng = random.Random(7)
+    for site_page in range(1, SITE_PAGES + 1):
+        write(f"housing_listing_{site_page}.html", housing_page(rng, site_page, ""))
+        write(f"squareyard_listing_{site_page}.html", squareyard_page(rng, site_page, "__BASE__"))
+    # NoBroker is one infinite-scroll page: the fully scrolled page for the parse benchmark,
+    # plus the shell and per-scroll batches the stand-in server streams.
+    batches = [[nobroker_card(rng, batch * CARDS_PER_PAGE + n, "") for n in range(CARDS_PER_PAGE)]
+               for batch in range(SITE_PAGES)]
+    write("nobroker_listing.html", chrome("NoBroker", "".join(card for batch in batches for card in batch)))
+    write("nobroker_shell.html", chrome("NoBroker", '<div id="listings">__CARDS__</div>' + NOBROKER_SCROLL_JS))
+    for batch, cards in enumerate(batches, start=1):
+        write(f"nobroker_batch_{batch}.html", "".join(cards))
+    write("housing_detail.html", housing_detail())
+    write("nobroker_detail.html", nobroker_detail())
+    write("squareyard_detail.html", squareyard_detail())
+
+if __name__ == "__main__":
+    main()
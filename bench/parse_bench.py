@@ -0,0 +1,54 @@
+"""Microbenchmark for listing-card parsing against the saved fixtures.
+
+Times the compiled lxml schemas used by the scrapers and, when beautifulsoup4 is
+installed, a plain BeautifulSoup(html.parser) pass over the same page for reference.
+
+    python bench/parse_bench.py [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scrapers import housing, nobroker, squareyard
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+CASES = [
+    ("housing", "housing_listing_1.html", housing.parse_housing_cards),
+    ("nobroker", "nobroker_listing.html", nobroker.parse_nobroker_cards),
+    ("squareyard", "squareyard_listing_1.html", squareyard.parse_squareyard_cards),
+]
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        BeautifulSoup = None
+    print(f"{'source':<12}{'cards':>6}{'lxml ms':>10}{'cards/s':>10}{'bs4 parse ms':>14}")
+    for source, fixture, parse in CASES:
+        with open(os.path.join(FIXTURES, fixture)) as f:
+            page_source = f.read()
+        seconds, cards = best_of(lambda: parse(page_source, "Delhi", "Saket"), args.repeat)
+        reference = ""
+        if BeautifulSoup is not None:
+            bs4_seconds, _ = best_of(lambda: BeautifulSoup(page_source, "html.parser"), max(1, args.repeat // 5))
+            reference = f"{bs4_seconds * 1000:.2f}"
+        print(f"{source:<12}{len(cards):>6}{seconds * 1000:>10.2f}{len(cards) / seconds:>10.0f}{reference:>14}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
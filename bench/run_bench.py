@@ -0,0 +1,174 @@
+"""Offline scraper benchmark against the local fixture server.
+
+Drives scrape_squareyard, scrape_nobroker, scrape_housing and the /all endpoint
+against bench/server.py, then reports wall time, a per-phase breakdown, server
+requests/sec, listings/sec and peak RSS, and compares wall times with a stored
+baseline.
+
+    python bench/run_bench.py                       # http fetch mode, compare with bench/baseline.json
+    python bench/run_bench.py --fetch-mode browser  # needs Chrome + chromedriver
+    python bench/run_bench.py --save-baseline
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import server as fixture_server
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+CITY, LOCALITY = "Delhi", "Saket"
+
+def configure_environment(base_url, workdir):
+    # The app reads these at import time, so they must be set before importing it.
+    os.environ.update({
+        "HOUSING_BASE_URL": base_url,
+        "NOBROKER_BASE_URL": base_url,
+        "SQUAREYARD_BASE_URL": base_url,
+        "GEOCODE_MODE": "stub",
+        "GEOCODE_DB": os.path.join(workdir, "geocode.sqlite3"),
+        "CACHE_DB": os.path.join(workdir, "cache.sqlite3"),
+        "HISTORY_DB": os.path.join(workdir, "history.sqlite3"),
+        # Every stand-in source is the same local host, so per-domain limits would only
+        # measure the limiter.
+        "DOMAIN_RATE_LIMIT": "0",
+        "HTTP_FETCH_FAILURE_LIMIT": "1000000",
+    })
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure(name, fn, server):
+    from app.utils import timing
+    timing.reset()
+    requests_before = server.requests_served
+    started = time.perf_counter()
+    listings = fn()
+    seconds = time.perf_counter() - started
+    served = server.requests_served - requests_before
+    return {
+        "scenario": name,
+        "wallSeconds": round(seconds, 4),
+        "listings": listings,
+        "listingsPerSecond": round(listings / seconds, 1) if seconds else 0.0,
+        "requests": served,
+        "requestsPerSecond": round(served / seconds, 1) if seconds else 0.0,
+        "phases": timing.snapshot(),
+    }
+
+def scraper_scenarios(pages, fetch_mode):
+    from app.scrapers import housing, nobroker, squareyard
+    scrapers = [
+        ("squareyard", squareyard.scrape_squareyard),
+        ("nobroker", nobroker.scrape_nobroker),
+        ("housing", housing.scrape_housing),
+    ]
+    for source, scrape in scrapers:
+        def run(scrape=scrape):
+            return sum(len(scrape(CITY, LOCALITY, page, use_cache=False, fetch_mode=fetch_mode)) for page in range(1, pages + 1))
+        yield f"{source} pages 1-{pages}", run
+
+def all_endpoint_scenario(fetch_mode):
+    import requests
+    import uvicorn
+    from app.main import app
+    port = free_port()
+    api = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=api.run, daemon=True)
+    thread.start()
+    while not api.started:
+        time.sleep(0.05)
+
+    def run():
+        response = requests.get(
+            f"http://127.0.0.1:{port}/all",
+            params={"city": CITY, "locality": LOCALITY, "page": 1, "no_cache": "true", "fetch_mode": fetch_mode},
+            timeout=600,
+        )
+        response.raise_for_status()
+        body = response.json()
+        return sum(len(body.get(source) or []) for source in ("squareyard", "nobroker", "housing"))
+
+    return run, lambda: setattr(api, "should_exit", True)
+
+def print_report(results):
+    print(f"{'scenario':<26}{'wall s':>9}{'listings':>10}{'list/s':>9}{'req':>6}{'req/s':>8}")
+    for result in results:
+        print(f"{result['scenario']:<26}{result['wallSeconds']:>9.3f}{result['listings']:>10}"
+              f"{result['listingsPerSecond']:>9.1f}{result['requests']:>6}{result['requestsPerSecond']:>8.1f}")
+        for source, phases in sorted(result["phases"].items()):
+            breakdown = ", ".join(f"{phase} {stats['seconds']:.3f}s/{stats['count']}" for phase, stats in sorted(phases.items()))
+            print(f"    {source:<12} {breakdown}")
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    previous = {result["scenario"]: result for result in baseline.get("results", [])}
+    print(f"\n{'scenario':<26}{'baseline s':>11}{'now s':>9}{'change':>9}")
+    for result in results:
+        before = previous.get(result["scenario"])
+        if not before:
+            print(f"{result['scenario']:<26}{'-':>11}{result['wallSeconds']:>9.3f}{'new':>9}")
+            continue
+        change = (result["wallSeconds"] - before["wallSeconds"]) / before["wallSeconds"] if before["wallSeconds"] else 0.0
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{result['scenario']:<26}{before['wallSeconds']:>11.3f}{result['wallSeconds']:>9.3f}{change:>+9.1%}{flag}")
+        if flag:
+            regressions.append(result["scenario"])
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against the local fixture server.")
+    parser.add_argument("--fetch-mode", default="http", choices=("http", "browser", "auto"))
+    parser.add_argument("--pages", type=int, default=3, help="API pages to request per source")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated network latency per response")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging a regression")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="scraper-bench-")
+    server = fixture_server.start(latency=args.latency_ms / 1000)
+    configure_environment(server.base_url, workdir)
+
+    results = [measure(name, run, server) for name, run in scraper_scenarios(args.pages, args.fetch_mode)]
+    run_all, stop_api = all_endpoint_scenario(args.fetch_mode)
+    try:
+        results.append(measure("/all page 1", run_all, server))
+    finally:
+        stop_api()
+
+    report = {"fetchMode": args.fetch_mode, "latencyMs": args.latency_ms, "peakRssMb": peak_rss_mb(), "results": results}
+    print_report(results)
+    print(f"\npeak RSS {report['peakRssMb']} MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline, args.tolerance) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
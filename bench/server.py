@@ -0,0 +1,125 @@
+"""Local stand-in for squareyards.com, nobroker.in and housing.com that replays bench/fixtures.
+
+    python bench/server.py --port 8900 --latency-ms 50
+
+Point the scrapers at it with HOUSING_BASE_URL, NOBROKER_BASE_URL and
+SQUAREYARD_BASE_URL (bench/run_bench.py does this for you).
+"""
+import argparse
+import hashlib
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+EMPTY_PAGE = "<!DOCTYPE html><html><head><title>No results</title></head><body><main></main></body></html>"
+
+def read_fixture(name):
+    path = os.path.join(FIXTURES, name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
+
+def coordinates(listing_id):
+    digest = hashlib.sha1(listing_id.encode()).hexdigest()
+    return f"{28.40 + int(digest[:6], 16) / 0xFFFFFF / 10:.6f}", f"{77.00 + int(digest[6:12], 16) / 0xFFFFFF / 10:.6f}"
+
+def site_page(query):
+    try:
+        return int(query.get("page", ["1"])[0])
+    except ValueError:
+        return 1
+
+def housing_listing(match, query):
+    return read_fixture(f"housing_listing_{site_page(query)}.html") or EMPTY_PAGE
+
+def squareyard_listing(match, query):
+    return read_fixture(f"squareyard_listing_{site_page(query)}.html") or EMPTY_PAGE
+
+def nobroker_listing(match, query):
+    return read_fixture("nobroker_shell.html").replace("__CARDS__", read_fixture("nobroker_batch_1.html"))
+
+def nobroker_batch(match, query):
+    return read_fixture(f"nobroker_batch_{match.group(1)}.html")
+
+def detail(fixture):
+    def render(match, query):
+        lat, lon = coordinates(match.group(1))
+        return read_fixture(fixture).replace("__LAT__", lat).replace("__LON__", lon)
+    return render
+
+ROUTES = [
+    (re.compile(r"^/in/buy/resale/page/([^/]+)$"), detail("housing_detail.html")),
+    (re.compile(r"^/in/buy/[^/]+/[^/]+$"), housing_listing),
+    (re.compile(r"^/sale/property-for-sale-in-[^/]+$"), squareyard_listing),
+    (re.compile(r"^/(?:resale|project)/([^/]+)$"), detail("squareyard_detail.html")),
+    (re.compile(r"^/property/sale/([^/]+)$"), detail("nobroker_detail.html")),
+    (re.compile(r"^/property/sale/[^/]+/[^/]+$"), nobroker_listing),
+    (re.compile(r"^/__bench/nobroker/batch/(\d+)$"), nobroker_batch),
+]
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, FixtureHandler)
+        self.latency = latency
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._count_lock:
+            self.requests_served += 1
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.count()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        body = None
+        for pattern, render in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                body = render(match, query)
+                break
+        if body is None:
+            self.send_error(404)
+            return
+        payload = body.replace("__BASE__", self.server.base_url).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start(host="127.0.0.1", port=0, latency=0.0):
+    server = FixtureServer((host, port), latency)
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the bench fixtures as a local stand-in site.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    args = parser.parse_args(argv)
+    server = FixtureServer((args.host, args.port), args.latency_ms / 1000)
+    print(f"Serving fixtures on {server.base_url}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
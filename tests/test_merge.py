@@ -0,0 +1,76 @@
+import random
+from app.utils.merge import MERGE_PRICE_TOLERANCE, merge
+
+def listing(source, name, price, lat=28.5245, lon=77.2066, **fields):
+    return {"source": source, "name": name, "price": price, "latitude": lat, "longitude": lon,
+            "city": "Delhi", "locality": "Saket", "link": f"https://{source}.example/{name}/{price}", **fields}
+
+def test_merges_the_same_property_across_sources():
+    merged = merge([
+        listing("squareyard", "DLF Capital Greens Tower A", "₹ 1.2 Cr"),
+        listing("housing", "Capital Greens Tower A by DLF", "₹ 1.25 Cr", lat=28.5248),
+        listing("nobroker", "DLF Capital Greens", "₹ 1.18 Cr", lon=77.2069),
+    ])
+    assert len(merged) == 1
+    assert sorted(merged[0]["sources"]) == ["housing", "nobroker", "squareyard"]
+    assert merged[0]["priceRangeInr"] == [11_800_000, 12_500_000]
+    assert merged[0]["provenance"]["name"] == "squareyard"
+
+def test_keeps_listings_from_one_source_apart():
+    merged = merge([listing("housing", "DLF Capital Greens", "₹ 1.2 Cr"), listing("housing", "DLF Capital Greens", "₹ 1.2 Cr")])
+    assert len(merged) == 2
+
+def test_does_not_chain_two_listings_of_one_source_through_another():
+    merged = merge([
+        listing("squareyard", "DLF Capital Greens", "₹ 1.2 Cr"),
+        listing("housing", "DLF Capital Greens", "₹ 1.2 Cr"),
+        listing("squareyard", "DLF Capital Greens", "₹ 1.21 Cr"),
+    ])
+    assert sorted(len(record["listings"]) for record in merged) == [1, 2]
+
+def test_price_tolerance_holds_across_the_whole_cluster():
+    # Each neighbouring pair is within tolerance, the ends are not.
+    merged = merge([
+        listing("squareyard", "DLF Capital Greens", "₹ 1.00 Cr"),
+        listing("housing", "DLF Capital Greens", "₹ 1.12 Cr"),
+        listing("nobroker", "DLF Capital Greens", "₹ 1.25 Cr"),
+    ])
+    assert len(merged) == 2
+    for record in merged:
+        low, high = record["priceRangeInr"]
+        assert high - low <= MERGE_PRICE_TOLERANCE * high
+
+def test_matches_unlocated_listing_by_name():
+    merged = merge([
+        listing("squareyard", "DLF Capital Greens", "₹ 1.2 Cr"),
+        listing("nobroker", "DLF Capital Greens", "₹ 1.2 Cr", lat=None, lon=None),
+    ])
+    assert len(merged) == 1
+
+def test_distinct_listings_with_a_generic_name_stay_apart():
+    rng = random.Random(7)
+    listings = [
+        listing(source, "3 BHK Apartment in Saket", f"₹ {rng.randint(80, 250)} Lac",
+                lat=28.5245 + rng.uniform(0, 0.0036), lon=77.2066 + rng.uniform(0, 0.004))
+        for source in ("squareyard", "housing", "nobroker")
+        for _ in range(100)
+    ]
+    merged = merge(listings)
+    assert sum(len(record["listings"]) for record in merged) == len(listings)
+    assert len(merged) >= 100
+    for record in merged:
+        sources = [entry["source"] for entry in record["listings"]]
+        assert len(sources) == len(set(sources))
+        low, high = record["priceRangeInr"]
+        assert high - low <= MERGE_PRICE_TOLERANCE * high
+
+def test_dense_generic_listings_stay_bounded():
+    rng = random.Random(11)
+    listings = [
+        listing(rng.choice(("squareyard", "housing", "nobroker")), "3 BHK Apartment in Saket", f"₹ {rng.randint(80, 250)} Lac",
+                lat=28.5245 + rng.uniform(0, 0.0036), lon=77.2066 + rng.uniform(0, 0.004))
+        for _ in range(6000)
+    ]
+    merged = merge(listings)
+    assert sum(len(record["listings"]) for record in merged) == len(listings)
+    assert max(len(record["listings"]) for record in merged) <= 3
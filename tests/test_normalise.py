@@ -0,0 +1,60 @@
+import pytest
+from app.models import Property
+from app.utils.normalise import normalise_page, parse_area, parse_price
+
+@pytest.mark.parametrize("value, expected", [
+    ("₹2.05 Cr", 20_500_000),
+    ("78.5 Lac", 7_850_000),
+    ("45 L", 4_500_000),
+    ("Rs. 50 Lakhs", 5_000_000),
+    ("₹ 1,20,00,000", 12_000_000),
+    ("₹20.5K", 20_500),
+    ("₹12,500/sq.ft", 12_500),
+    ("EMI ₹45K/month", 45_000),
+    ("1.2Cr.", 12_000_000),
+    (3_500_000, 3_500_000),
+])
+def test_parse_price(value, expected):
+    assert parse_price(value) == expected
+
+@pytest.mark.parametrize("value, expected", [
+    ("₹ 1.5 - 2 Cr", 15_000_000),
+    ("₹ 85 Lac - 1.1 Cr", 8_500_000),
+])
+def test_parse_price_range_is_low_end_in_range_unit(value, expected):
+    assert parse_price(value) == expected
+
+def test_parse_price_skips_numbers_that_are_not_money():
+    assert parse_price("2 BHK ₹ 1.2 Cr") == 12_000_000
+
+@pytest.mark.parametrize("value", [None, "", "3 BHK", "Price on request"])
+def test_parse_price_unknown(value):
+    assert parse_price(value) is None
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,234 sq.ft", 1234.0),
+    ("950 Sq. Ft.", 950.0),
+    ("1500 square feet", 1500.0),
+    ("120 sq.m", 1291.7),
+    ("100 sqm", 1076.4),
+    ("80 m2", 861.1),
+    ("200 sq.yd", 1800.0),
+    ("1200", 1200.0),
+    ("1200 - 1500 sqft", 1200.0),
+    ("3 BHK 1200 sqft", 1200.0),
+])
+def test_parse_area(value, expected):
+    assert parse_area(value) == expected
+
+@pytest.mark.parametrize("value", [None, "2 acres", "2 BHK", "₹ 1200"])
+def test_parse_area_unknown(value):
+    assert parse_area(value) is None
+
+def test_normalise_page():
+    props = normalise_page([
+        Property(price="₹ 1.5 - 2 Cr", builtUp="3 BHK 1200 sqft", latitude="28.52", longitude="0"),
+        Property(price="₹ 1.5 - 2 Cr", builtUp="2 acres"),
+    ])
+    assert [prop.priceInr for prop in props] == [15_000_000, 15_000_000]
+    assert [prop.builtUpSqft for prop in props] == [1200.0, None]
+    assert (props[0].latitude, props[0].longitude) == (28.52, None)